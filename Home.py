@@ -2,6 +2,8 @@
 import streamlit as st
 from ui_utils import load_theme
 from auth import UserAuth, init_session_state, logout_user
+from config import Config
+import model_loader
 import re
 
 st.set_page_config(
@@ -13,6 +15,11 @@ st.set_page_config(
 load_theme()
 init_session_state()
 
+# Warm up the AI models in the background while the user logs in. With a job server configured
+# the models live in that process, and the web tier never loads them.
+if Config.PRELOAD_MODELS and not Config.JOB_SERVER_URL:
+    model_loader.start_background_loading()
+
 # Initialize auth system
 auth = UserAuth()
 
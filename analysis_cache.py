@@ -0,0 +1,193 @@
+# analysis_cache.py
+#
+# This module defines the AnalysisCache class, a two-tier cache (in-memory LRU plus SQLite on disk)
+# for MoodAnalyzer results. Users resubmit the same descriptions and the sample buttons send fixed
+# strings, so the sentiment result, text embedding and base parameters are stored per normalized
+# text and survive restarts. Keys include the model names and the mood descriptor hash, so changing
+# Config.SENTIMENT_MODEL, Config.EMBEDDING_MODEL or the mood prototypes invalidates old entries.
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config import Config
+
+
+def _to_json(value):
+    """json.dumps fallback for numpy scalars in the parameters."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def normalize_text(text):
+    """Case-fold and collapse whitespace, so trivially different descriptions share an entry."""
+    return " ".join(str(text).split()).lower()
+
+
+class AnalysisCache:
+    """
+    Stores {"sentiment", "embedding", "parameters"} per normalized input text and analysis setup.
+    Lookups check the in-memory LRU first, then SQLite; disk hits are promoted to memory.
+    Both tiers evict least recently used entries once they exceed their entry limit.
+    """
+    def __init__(self, model_names, descriptions_hash="", db_path=None, memory_entries=None, disk_entries=None):
+        self.namespace = json.dumps({"models": list(model_names), "descriptions": descriptions_hash})
+        self.db_path = db_path or Config.ANALYSIS_CACHE_PATH
+        self.memory_entries = memory_entries or Config.ANALYSIS_CACHE_MEMORY_ENTRIES
+        self.disk_entries = disk_entries or Config.ANALYSIS_CACHE_DISK_ENTRIES
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS analyses (
+                    key TEXT PRIMARY KEY,
+                    sentiment TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    parameters TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_accessed ON analyses (accessed_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def make_key(self, text):
+        payload = f"{self.namespace}\n{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text):
+        """
+        Return a copy of the cached analysis of `text`, or None on a miss.
+        """
+        key = self.make_key(text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return copy.deepcopy(self._memory[key])
+
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT sentiment, embedding, parameters FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    # Refresh the access time so disk eviction stays LRU
+                    conn.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis cache read failed: {e}")
+            row = None
+
+        if row is None:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        entry = {
+            "sentiment": json.loads(row[0]),
+            "embedding": np.frombuffer(row[1], dtype=np.float32).copy(),
+            "parameters": json.loads(row[2]),
+        }
+        with self._lock:
+            self.counters["disk_hits"] += 1
+            self._remember(key, entry)
+        return copy.deepcopy(entry)
+
+    def put(self, text, sentiment, embedding, parameters):
+        """
+        Store the analysis of `text` in both tiers.
+        """
+        key = self.make_key(text)
+        entry = {
+            "sentiment": {"label": sentiment["label"], "score": float(sentiment["score"])},
+            "embedding": np.asarray(embedding, dtype=np.float32).ravel().copy(),
+            "parameters": copy.deepcopy(parameters),
+        }
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analyses (key, sentiment, embedding, parameters, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(entry["sentiment"]), entry["embedding"].tobytes(),
+                     json.dumps(entry["parameters"], default=_to_json), time.time())
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis cache write failed: {e}")
+
+        with self._lock:
+            self._remember(key, entry)
+            self._puts += 1
+            evict = self._puts % 100 == 0
+        if evict:
+            self._evict_disk()
+
+    def _remember(self, key, entry):
+        """
+        Insert into the in-memory LRU and evict down to its entry limit. Caller holds the lock.
+        """
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """
+        Delete the least recently used rows beyond the disk entry limit.
+        """
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "DELETE FROM analyses WHERE key IN ("
+                    "SELECT key FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_entries,)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis cache eviction failed: {e}")
+
+    def stats(self):
+        """
+        Return hit/miss counters and the size of the in-memory tier.
+        """
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                **self.counters,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
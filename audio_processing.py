@@ -0,0 +1,139 @@
+# audio_processing.py
+#
+# Vectorized post-processing for generated audio: DC removal, block-based loudness normalization,
+# short fades and the final int16 conversion. All steps work in place on one float32 buffer,
+# so the only full-size allocation is the int16 output.
+
+import numpy as np
+
+from config import Config
+
+# Block layout used for loudness measurement, following ITU-R BS.1770
+BLOCK_SECONDS = 0.4
+HOP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+
+def remove_dc(audio):
+    """
+    Subtract the mean so the waveform is centred on zero.
+    """
+    audio -= audio.mean(dtype=np.float64)
+    return audio
+
+
+def integrated_loudness(audio, sample_rate):
+    """
+    Measure gated integrated loudness over 400 ms blocks with 75% overlap.
+    Energies are computed per 100 ms hop with a dot product so no squared copy of the
+    signal is allocated. The K-weighting filter is omitted, which keeps the measurement
+    vectorized and is close enough for music at MusicGen's bandwidth.
+    Returns -inf for silent or too-short audio.
+    """
+    hop = int(sample_rate * HOP_SECONDS)
+    hops_per_block = int(round(BLOCK_SECONDS / HOP_SECONDS))
+    num_hops = len(audio) // hop
+    if num_hops < hops_per_block:
+        return float("-inf")
+
+    hops = audio[:num_hops * hop].reshape(num_hops, hop)
+    hop_energy = np.einsum("ij,ij->i", hops, hops, dtype=np.float64)
+
+    # Sum each run of consecutive hops into one overlapping block
+    cumulative = np.concatenate(([0.0], np.cumsum(hop_energy)))
+    block_power = (cumulative[hops_per_block:] - cumulative[:-hops_per_block]) / (hop * hops_per_block)
+
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(block_power)
+
+    gated = block_power[block_loudness > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return float("-inf")
+
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = block_power[block_loudness > relative_gate]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def loudness_gain(audio, sample_rate, target_lufs, peak_ceiling_dbfs=-1.0):
+    """
+    Linear gain that moves the audio towards `target_lufs` without pushing the peak above
+    the ceiling. Returns 1.0 for silent audio instead of dividing by zero.
+    """
+    loudness = integrated_loudness(audio, sample_rate)
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    if not np.isfinite(loudness) or peak == 0.0:
+        return 1.0
+
+    gain = 10 ** ((target_lufs - loudness) / 20)
+    max_gain = 10 ** (peak_ceiling_dbfs / 20) / peak
+    return min(gain, max_gain)
+
+
+def normalize_loudness(audio, sample_rate, target_lufs, peak_ceiling_dbfs=-1.0):
+    """
+    Scale the audio in place towards `target_lufs`, limited so the peak stays below the ceiling.
+    """
+    audio *= loudness_gain(audio, sample_rate, target_lufs, peak_ceiling_dbfs)
+    return audio
+
+
+def apply_fades(audio, sample_rate, fade_in_seconds, fade_out_seconds):
+    """
+    Apply linear fade-in and fade-out ramps in place. Only the ramps are allocated.
+    """
+    fade_in = min(int(sample_rate * fade_in_seconds), len(audio))
+    fade_out = min(int(sample_rate * fade_out_seconds), len(audio))
+    if fade_in > 0:
+        audio[:fade_in] *= np.linspace(0.0, 1.0, fade_in, dtype=np.float32)
+    if fade_out > 0:
+        audio[-fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)
+    return audio
+
+
+def equal_power_crossfade(tail, head):
+    """
+    Blend the end of one window (`tail`) into the start of the next (`head`) in place on `tail`.
+    Sine/cosine gains keep the summed power constant across the overlap.
+    """
+    ramp = np.linspace(0.0, np.pi / 2, len(tail), dtype=np.float32)
+    tail *= np.cos(ramp)
+    tail += head[:len(tail)] * np.sin(ramp)
+    return tail
+
+
+def to_int16(audio):
+    """
+    Clip to [-1, 1] and convert to 16-bit PCM. The int16 array is the only allocation.
+    """
+    np.clip(audio, -1.0, 1.0, out=audio)
+    audio *= 32767
+    np.rint(audio, out=audio)
+    return audio.astype(np.int16)
+
+
+def energy_to_loudness_target(energy_level):
+    """
+    Map the energy level (1-10) to a loudness target in LUFS.
+    Keeps the old volume curve of 0.6 + energy / 25 as a gain offset from the base target.
+    """
+    volume_factor = 0.6 + (energy_level / 25)
+    return Config.TARGET_LOUDNESS_LUFS + 20 * np.log10(volume_factor)
+
+
+def postprocess(audio, sample_rate, energy_level=5):
+    """
+    Run the full post-processing chain on mono float audio and return int16 PCM.
+    The input buffer is modified in place when it is already a float32 array.
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+
+    remove_dc(audio)
+    normalize_loudness(
+        audio, sample_rate,
+        target_lufs=energy_to_loudness_target(energy_level),
+        peak_ceiling_dbfs=Config.PEAK_CEILING_DBFS
+    )
+    apply_fades(audio, sample_rate, Config.FADE_IN_SECONDS, Config.FADE_OUT_SECONDS)
+    return to_int16(audio)
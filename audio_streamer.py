@@ -0,0 +1,120 @@
+# audio_streamer.py
+#
+# This module defines the MusicgenStreamer class, which receives MusicGen token frames while
+# `model.generate` is still running and decodes them into playable audio chunks.
+
+from queue import Queue
+
+import numpy as np
+import torch
+from transformers import StoppingCriteria
+
+
+class MusicgenStreamer(StoppingCriteria):
+    """
+    Streamer for MusicGen that decodes accumulated codebook tokens every `play_steps` frames.
+    Decoded chunks are pushed onto a queue and can be consumed by iterating over the streamer.
+
+    It hooks into `generate` as a stopping criterion that never stops, because the criteria
+    see the full token sequence after every step while the `streamer` argument is not
+    forwarded by MusicGen in every transformers release.
+    """
+    def __init__(self, model, play_steps=100, stride=None, timeout=None):
+        """
+        Args:
+            model: A loaded MusicgenForConditionalGeneration model.
+            play_steps (int): Number of token frames to accumulate before decoding a chunk.
+                Must exceed the number of codebooks, which the delay pattern leaves unfinished.
+            stride (int): Audio samples held back at each chunk boundary so the next decode
+                can smooth over them. Derived from the codec hop length when not given.
+            timeout (float): Seconds to wait on the queue before raising, or None to wait forever.
+        """
+        self.decoder = model.decoder
+        self.audio_encoder = model.audio_encoder
+        self.generation_config = model.generation_config
+        self.play_steps = play_steps
+        self.timeout = timeout
+
+        if stride is not None:
+            self.stride = stride
+        else:
+            hop_length = int(np.prod(self.audio_encoder.config.upsampling_ratios))
+            self.stride = hop_length * (play_steps - self.decoder.num_codebooks) // 6
+        if self.stride < 1:
+            raise ValueError(
+                f"play_steps={play_steps} is too small to stream: it must be more than the "
+                f"{self.decoder.num_codebooks} codebooks and leave a positive stride"
+            )
+
+        self.token_cache = None
+        self.to_yield = 0
+        self.audio_queue = Queue()
+        self.stop_signal = None
+
+    def decode_tokens(self, input_ids):
+        """
+        Undo the codebook delay pattern on the cached tokens and decode them with EnCodec.
+        Returns the decoded mono audio as a float32 numpy array.
+        """
+        _, delay_pattern_mask = self.decoder.build_delay_pattern_mask(
+            input_ids[:, :1],
+            pad_token_id=self.generation_config.decoder_start_token_id,
+            max_length=input_ids.shape[-1],
+        )
+        input_ids = self.decoder.apply_delay_pattern_mask(input_ids, delay_pattern_mask)
+
+        # Drop the frames that are still padded because of the delay pattern
+        input_ids = input_ids[input_ids != self.generation_config.pad_token_id].reshape(
+            1, self.decoder.num_codebooks, -1
+        )
+        input_ids = input_ids[None, ...].to(self.audio_encoder.device)
+
+        with torch.inference_mode():
+            output_values = self.audio_encoder.decode(input_ids, audio_scales=[None])
+        audio_values = output_values.audio_values[0, 0]
+        return audio_values.cpu().float().numpy()
+
+    def __call__(self, input_ids, scores, **kwargs):
+        """
+        Called by `generate` after every step with the tokens generated so far for every codebook.
+        """
+        batch_size = input_ids.shape[0] // self.decoder.num_codebooks
+        if batch_size > 1:
+            raise ValueError("MusicgenStreamer only supports a batch size of 1")
+
+        self.token_cache = input_ids
+        if input_ids.shape[-1] % self.play_steps == 0:
+            audio_values = self.decode_tokens(input_ids)
+            self.on_finalized_audio(audio_values[self.to_yield:-self.stride])
+            self.to_yield = len(audio_values) - self.stride
+
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    def end(self):
+        """
+        Called once `generate` has returned: flush the remaining audio and stop the stream.
+        """
+        if self.token_cache is not None:
+            audio_values = self.decode_tokens(self.token_cache)
+        else:
+            audio_values = np.zeros(self.to_yield, dtype=np.float32)
+
+        self.on_finalized_audio(audio_values[self.to_yield:], stream_end=True)
+
+    def on_finalized_audio(self, audio, stream_end=False):
+        """
+        Put a decoded chunk on the queue, followed by the stop signal at the end of the stream.
+        """
+        if len(audio):
+            self.audio_queue.put(audio, timeout=self.timeout)
+        if stream_end:
+            self.audio_queue.put(self.stop_signal, timeout=self.timeout)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        value = self.audio_queue.get(timeout=self.timeout)
+        if value is self.stop_signal:
+            raise StopIteration()
+        return value
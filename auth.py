@@ -1,9 +1,11 @@
 # auth.py
 import sqlite3
 import hashlib
+import json
 import streamlit as st
 from datetime import datetime
 import os
+from metrics import metrics
 
 class UserAuth:
     def __init__(self, db_path="users.db"):
@@ -42,10 +44,18 @@ class UserAuth:
                 chord_progression TEXT,
                 audio_filename TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                seed INTEGER,
+                params_json TEXT,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
-        
+
+        # Add the blueprint columns to databases created before they existed
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(music_history)")}
+        for column, column_type in (("seed", "INTEGER"), ("params_json", "TEXT")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE music_history ADD COLUMN {column} {column_type}")
+
         conn.commit()
         conn.close()
     
@@ -126,23 +136,27 @@ class UserAuth:
             conn.close()
             return False, "Email already exists!"
     
+    @metrics.span("history_write")
     def save_music_history(self, user_id, prompt, params, audio_filename):
-        """Save music generation history"""
+        """Save music generation history, with the seed and full blueprint needed to recreate it"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+
         chord_progression = " - ".join(params.get("chord_progression", []))
-        
+        params_json = json.dumps(params, default=lambda value: value.tolist())
+
         cursor.execute('''
-            INSERT INTO music_history 
-            (user_id, prompt, mood_category, energy_level, tempo, 
-             suggested_key, scale_type, chord_progression, audio_filename)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO music_history
+            (user_id, prompt, mood_category, energy_level, tempo,
+             suggested_key, scale_type, chord_progression, audio_filename,
+             seed, params_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             user_id, prompt, params.get("mood_category"),
             params.get("energy_level"), params.get("tempo"),
             params.get("suggested_key"), params.get("scale_type"),
-            chord_progression, audio_filename
+            chord_progression, audio_filename,
+            params.get("seed"), params_json
         ))
         
         conn.commit()
@@ -156,7 +170,7 @@ class UserAuth:
         cursor.execute('''
             SELECT prompt, mood_category, energy_level, tempo, 
                    suggested_key, scale_type, chord_progression, 
-                   audio_filename, created_at
+                   audio_filename, created_at, seed, params_json
             FROM music_history 
             WHERE user_id = ? 
             ORDER BY created_at DESC 
@@ -175,7 +189,9 @@ class UserAuth:
             'scale_type': row[5],
             'chord_progression': row[6],
             'audio_filename': row[7],
-            'created_at': row[8]
+            'created_at': row[8],
+            'seed': row[9],
+            'params': json.loads(row[10]) if row[10] else None
         } for row in history]
 
 # Session management functions
@@ -0,0 +1,187 @@
+# batch_generate.py
+#
+# Command-line bulk generation. Streams prompts from a JSONL file through the same pipeline as the
+# Compose page (mood analysis, generate_advanced_parameters, MusicGen) in batches, with one batched
+# analysis and one `generate` call per batch. Each track is written to the output folder as <id>.mp3 and
+# one line per item is appended to a results JSONL with its timings and blueprint.
+#
+# Input lines look like {"id": "spot-01", "prompt": "calm piano for a rainy morning"}; "id" defaults
+# to the line number, and "seed" and "duration_seconds" are optional. Re-running with the same
+# output folder skips the items already marked "ok" in the results file, so an interrupted run
+# resumes where it stopped and failed items are retried.
+#
+# Usage: python batch_generate.py prompts.jsonl [--out-dir batch_output] [--batch-size 4]
+
+import argparse
+import json
+import shutil
+import time
+from pathlib import Path
+
+from config import Config
+from memory_tracker import request_context
+
+
+def read_prompts(path):
+    """
+    Yields the input items one at a time, so large files are never loaded whole.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not item.get("prompt"):
+                raise ValueError(f"Line {line_number} has no 'prompt'")
+            item["id"] = str(item.get("id", line_number))
+            yield item
+
+
+def load_completed(results_path):
+    """
+    Ids already generated successfully by an earlier run.
+    """
+    completed = set()
+    if not results_path.exists():
+        return completed
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            if result.get("status") == "ok":
+                completed.add(result["id"])
+    return completed
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batch(batch, analyzer, processor, generator, out_dir):
+    """
+    Analyzes, plans and generates one batch. Returns one result dict per item, in input order.
+    "generate_seconds" is the wall time of the shared batched `generate` call and "batch_seconds"
+    (added by main) the wall time of the whole batch.
+    """
+    results = []
+    params_list = []
+    # One batched analysis for the whole batch; each item is charged an equal share of its time
+    start = time.perf_counter()
+    with request_context(",".join(item["id"] for item in batch)):
+        base_params_list = analyzer.analyze_many([item["prompt"] for item in batch])
+    analysis_seconds = (time.perf_counter() - start) / len(batch)
+
+    for item, base_params in zip(batch, base_params_list):
+        start = time.perf_counter()
+        params = processor.generate_advanced_parameters(base_params, seed=item.get("seed"))
+        if item.get("duration_seconds"):
+            params["duration_seconds"] = item["duration_seconds"]
+        parameters_seconds = time.perf_counter() - start
+
+        params_list.append(params)
+        results.append({
+            "id": item["id"],
+            "prompt": item["prompt"],
+            "analysis_seconds": round(analysis_seconds, 4),
+            "parameters_seconds": round(parameters_seconds, 4),
+        })
+
+    start = time.perf_counter()
+    try:
+        with request_context(",".join(item["id"] for item in batch)):
+            futures = generator.generate_batch_async(params_list)
+    except Exception as e:
+        print(f"🔥 Batch generation failed: {e}")
+        for result in results:
+            result.update(status="error", error=str(e))
+        return results
+    generate_seconds = time.perf_counter() - start
+
+    for result, params, future in zip(results, params_list, futures):
+        start = time.perf_counter()
+        try:
+            audio_path = out_dir / f"{result['id']}.mp3"
+            shutil.move(future.result(), audio_path)
+        except Exception as e:
+            result.update(status="error", error=str(e))
+            continue
+        result.update(
+            status="ok",
+            audio_path=str(audio_path),
+            audio_seconds=params["duration_seconds"],
+            batch_size=len(batch),
+            generate_seconds=round(generate_seconds, 4),
+            save_seconds=round(time.perf_counter() - start, 4),
+            params=params,
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate tracks in bulk from a JSONL file of prompts.")
+    parser.add_argument("input", help="JSONL file with one {\"prompt\": ...} object per line")
+    parser.add_argument("--out-dir", default="batch_output", help="Folder for the MP3s and results.jsonl")
+    parser.add_argument("--results", help="Results JSONL (default: <out-dir>/results.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=Config.BATCH_MAX_SIZE,
+                        help="Prompts per generate call")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    results_path = Path(args.results) if args.results else out_dir / "results.jsonl"
+    completed = load_completed(results_path)
+    if completed:
+        print(f"⚡ Resuming: {len(completed)} items already done")
+
+    # Every item gets its full requested length; there is no interactive latency target here
+    Config.LATENCY_SLO_ENABLED = False
+
+    from mood_analyzer import MoodAnalyzer
+    from music_parameters import MusicParameterProcessor
+    from music_generator import MusicGenerator
+
+    analyzer = MoodAnalyzer()
+    processor = MusicParameterProcessor()
+    generator = MusicGenerator()
+
+    pending = (item for item in read_prompts(args.input) if item["id"] not in completed)
+    done = failed = 0
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    with open(results_path, "a", encoding="utf-8") as results_file:
+        for batch in batches(pending, args.batch_size):
+            batch_start = time.perf_counter()
+            for result in run_batch(batch, analyzer, processor, generator, out_dir):
+                result["batch_seconds"] = round(time.perf_counter() - batch_start, 4)
+                results_file.write(json.dumps(result, default=lambda value: value.tolist()) + "\n")
+                if result["status"] == "ok":
+                    done += 1
+                    audio_seconds += result["audio_seconds"]
+                else:
+                    failed += 1
+                    print(f"⚠️ {result['id']} failed: {result['error']}")
+            results_file.flush()
+            print(f"✅ {done} tracks done, {failed} failed")
+
+    elapsed = time.perf_counter() - start
+    if not done:
+        print(f"⚠️ No tracks generated ({failed} failed)")
+        return
+    print(f"🔥 {done} tracks ({audio_seconds:.0f}s of audio) in {elapsed / 60:.1f} min, {failed} failed")
+    print(f"⏱️ {done / (elapsed / 60):.2f} tracks/min, real-time factor {elapsed / audio_seconds:.2f} "
+          f"(seconds of compute per second of audio)")
+
+
+if __name__ == "__main__":
+    main()
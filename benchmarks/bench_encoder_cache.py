@@ -0,0 +1,116 @@
+# bench_encoder_cache.py
+#
+# Measures the text-encoder time saved per request by the encoder cache. Builds a stream of requests
+# from the real blueprint space (random mood, energy and sentiment run through the parameter
+# processor), then times tokenization plus the T5 encoder for every request without the cache and
+# with a fresh cache, which starts empty and fills as prompts repeat.
+#
+# Blueprints include a random tempo, so independent requests rarely repeat a prompt exactly. --pool N
+# draws the requests from N blueprints instead, modelling popular prompts, presets and Recreate.
+#
+# By default the encoder is the tiny random stand-in MusicGen from tiny_models.py, so the benchmark
+# works offline; --models real loads Config.MUSIC_GEN_MODEL instead. Compare like with like.
+#
+# Usage: python benchmarks/bench_encoder_cache.py [--models tiny|real] [--requests 200] [--pool 0] [--seed 0]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+MOODS = ["happy", "sad", "calm", "energetic", "mysterious", "romantic"]
+SENTIMENTS = ["LABEL_0", "LABEL_1", "LABEL_2"]
+
+
+def make_prompts(generator, count, seed):
+    """
+    Prompts as the Compose page would produce them, without loading the NLP models:
+    only the analyzer's rule-based parameter mapping is used.
+    """
+    from mood_analyzer import MoodAnalyzer
+    from music_parameters import MusicParameterProcessor
+
+    analyzer = MoodAnalyzer.__new__(MoodAnalyzer)
+    processor = MusicParameterProcessor()
+    rng = np.random.default_rng(seed)
+
+    prompts = []
+    for _ in range(count):
+        sentiment = {"label": str(rng.choice(SENTIMENTS)), "score": 0.9}
+        base = analyzer.generate_musical_parameters(str(rng.choice(MOODS)), int(rng.integers(1, 11)), sentiment)
+        params = processor.generate_advanced_parameters(base, seed=int(rng.integers(2**31)))
+        prompts.append(generator._create_prompt(params))
+    return prompts
+
+
+def time_uncached(generator, prompts):
+    import torch
+
+    timings = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        tokens = generator.processor(text=[prompt], padding=True, return_tensors="pt").to(generator.device)
+        with torch.inference_mode(), generator._autocast():
+            generator.model.text_encoder(**tokens)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_cached(generator, prompts):
+    from encoder_cache import EncoderCache
+
+    generator.encoder_cache = EncoderCache()
+    tier = generator._tier()
+    processor, model, generation_config = generator._backend(tier)
+    timings = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        generator._encode_prompts([prompt], tier["model"], processor, model, generation_config)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text-encoder time saved per request by the encoder cache.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pool", type=int, default=0, help="Draw requests from this many blueprints (0: all fresh)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny",
+                        help="tiny: random stand-in built offline; real: Config.MUSIC_GEN_MODEL")
+    args = parser.parse_args()
+
+    if args.models == "tiny":
+        from tiny_models import use_tiny_models
+        use_tiny_models()
+    Config.GENERATION_CACHE_ENABLED = False
+    from music_generator import MusicGenerator
+    generator = MusicGenerator()
+
+    prompts = make_prompts(generator, args.pool or args.requests, args.seed)
+    if args.pool:
+        rng = np.random.default_rng(args.seed)
+        prompts = [prompts[i] for i in rng.integers(0, len(prompts), args.requests)]
+    # Warm up kernels so the first measured request is not penalized
+    time_uncached(generator, prompts[:3])
+
+    uncached = np.array(time_uncached(generator, prompts)) * 1000
+    cached = np.array(time_cached(generator, prompts)) * 1000
+    stats = generator.encoder_cache.stats()
+
+    print(f"{args.requests} requests, {len(set(prompts))} distinct prompts, model {Config.MUSIC_GEN_MODEL}")
+    print(f"{'':>10} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for label, timings in (("uncached", uncached), ("cached", cached)):
+        print(f"{label:>10} {timings.mean():>10.2f} {np.percentile(timings, 50):>10.2f} {np.percentile(timings, 95):>10.2f}")
+    print(f"Saved per request: {uncached.mean() - cached.mean():.2f} ms "
+          f"(hit rate {stats['hit_rate']:.0%}, cache size {stats['memory_bytes'] / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# bench_inference_modes.py
+#
+# Compares MusicGen CPU inference modes (fp32, int8 dynamic quantization, bf16 autocast).
+# Each mode runs in its own process so peak RSS is measured in isolation. Decoding is greedy,
+# so every mode gets the same prompt and the outputs can be compared against fp32.
+#
+# By default the modes run on the tiny random stand-in MusicGen from tiny_models.py, so the benchmark
+# works offline; --models real loads Config.MUSIC_GEN_MODEL instead. Compare like with like.
+#
+# Usage: python benchmarks/bench_inference_modes.py [--models tiny|real] [--modes fp32 int8 bf16] [--seconds 5]
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+BENCH_PARAMS = {
+    "energy_level": 6, "genre_style": "folk", "mood_category": "happy", "suggested_key": "G",
+    "scale_type": "major", "tempo": 120, "instruments": ["piano", "guitar", "drums"],
+    "rhythmic_pattern": "straight", "texture": "homophonic"
+}
+
+
+def spectral_similarity(reference, candidate, frame=2048, hop=512):
+    """
+    Cosine similarity between log-magnitude spectrograms (1.0 means identical spectra).
+    More forgiving than waveform comparison for small phase differences.
+    """
+    length = min(len(reference), len(candidate))
+    if length < frame:
+        return float("nan")
+
+    window = np.hanning(frame).astype(np.float32)
+
+    def log_spectrogram(audio):
+        frames = np.lib.stride_tricks.sliding_window_view(audio[:length], frame)[::hop]
+        return np.log1p(np.abs(np.fft.rfft(frames * window, axis=1)))
+
+    ref_spec, cand_spec = log_spectrogram(reference), log_spectrogram(candidate)
+    denominator = np.linalg.norm(ref_spec) * np.linalg.norm(cand_spec)
+    return float((ref_spec * cand_spec).sum() / denominator) if denominator else float("nan")
+
+
+def run_worker(mode, seconds, out_path, models):
+    """
+    Load the generator in `mode`, time one greedy generation and save the audio.
+    Prints a JSON line with the measurements.
+    """
+    if models == "tiny":
+        from tiny_models import use_tiny_models
+        use_tiny_models()
+    Config.INFERENCE_MODE = mode
+    Config.GENERATION_CACHE_ENABLED = False
+
+    from music_generator import MusicGenerator
+
+    start = time.perf_counter()
+    generator = MusicGenerator()
+    load_seconds = time.perf_counter() - start
+    prompt = generator._create_prompt(BENCH_PARAMS)
+
+    # Short warm-up so one-time kernel setup does not count against the mode
+    generator._generate_audio([prompt], num_tokens=10, do_sample=False)
+
+    # MusicGen produces 50 token frames per second of audio
+    num_tokens = int(seconds * 50)
+    start = time.perf_counter()
+    audio = generator._generate_audio([prompt], num_tokens=num_tokens, do_sample=False)
+    elapsed = time.perf_counter() - start
+
+    audio_np = audio.squeeze().float().cpu().numpy()
+    np.save(out_path, audio_np)
+
+    print(json.dumps({
+        "mode": generator.inference_mode,
+        "requested_mode": mode,
+        "load_seconds": round(load_seconds, 2),
+        "generate_seconds": round(elapsed, 2),
+        "tokens_per_second": round(num_tokens / elapsed, 2),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run(modes, seconds, models):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        outputs = {}
+        for mode in ["fp32"] + [m for m in modes if m != "fp32"]:
+            out_path = os.path.join(tmp_dir, f"{mode}.npy")
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", mode,
+                 "--seconds", str(seconds), "--out", out_path, "--models", models],
+                cwd=ROOT, capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(f"🔥 Mode {mode} failed:\n{completed.stderr[-2000:]}")
+                continue
+
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            outputs[mode] = np.load(out_path)
+            if "fp32" in outputs:
+                result["spectral_similarity"] = round(spectral_similarity(outputs["fp32"], outputs[mode]), 4)
+            if mode in modes:
+                results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MusicGen CPU inference modes.")
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny",
+                        help="tiny: random stand-in built offline; real: Config.MUSIC_GEN_MODEL")
+    parser.add_argument("--modes", nargs="+", default=["fp32", "int8", "bf16"], choices=["fp32", "int8", "bf16"])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Seconds of audio to generate per mode")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.seconds, args.out, args.models)
+        return
+
+    results = run(args.modes, args.seconds, args.models)
+    print(f"{'mode':>6} {'tokens/s':>9} {'generate (s)':>13} {'peak RSS (MB)':>14} {'similarity':>11}")
+    for row in results:
+        print(f"{row['mode']:>6} {row['tokens_per_second']:>9} {row['generate_seconds']:>13} "
+              f"{row['peak_rss_mb']:>14} {row.get('spectral_similarity', float('nan')):>11}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
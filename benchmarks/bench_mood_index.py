@@ -0,0 +1,71 @@
+# bench_mood_index.py
+#
+# Measures mood classification cost as the prototype vocabulary grows. Random unit vectors stand in
+# for the descriptor embeddings (384 dimensions, like all-MiniLM-L6-v2), so no model is loaded: the
+# benchmark times only the lookup. For each prototype count it compares the MoodPrototypeIndex
+# (one matrix product plus a per-mood max) with scoring prototypes one at a time, the way
+# classify_mood used to, for a single text and for a batch.
+#
+# Usage: python benchmarks/bench_mood_index.py [--dim 384] [--moods 6] [--batch 32] [--repeats 50]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mood_index import MoodPrototypeIndex
+
+PROTOTYPES_PER_MOOD = (1, 10, 100, 1000)
+
+
+def looped_best(moods, prototypes, query):
+    """
+    Per-prototype cosine similarity in a Python loop, for comparison.
+    """
+    best_scores = {}
+    for mood, prototype in zip(moods, prototypes):
+        score = float(np.dot(query, prototype) / (np.linalg.norm(query) * np.linalg.norm(prototype)))
+        best_scores[mood] = max(best_scores.get(mood, -1.0), score)
+    return max(best_scores, key=best_scores.get)
+
+
+def time_ms(function, repeats):
+    function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mood classification cost against the number of prototypes.")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--moods", type=int, default=6)
+    parser.add_argument("--batch", type=int, default=32, help="Texts per batched classification")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.batch, args.dim)).astype(np.float32)
+    print(f"{'prototypes':>10} {'looped (ms)':>12} {'index (ms)':>12} {'batch of ' + str(args.batch) + ' (ms/text)':>24}")
+    for per_mood in PROTOTYPES_PER_MOOD:
+        moods = [f"mood_{mood}" for mood in range(args.moods) for _ in range(per_mood)]
+        prototypes = rng.standard_normal((len(moods), args.dim)).astype(np.float32)
+        index = MoodPrototypeIndex(moods, prototypes)
+        assert index.best(queries[0])[0] == looped_best(moods, prototypes, queries[0])
+
+        looped = time_ms(lambda: looped_best(moods, prototypes, queries[0]), max(1, args.repeats // per_mood))
+        single = time_ms(lambda: index.classify(queries[0]), args.repeats)
+        batched = time_ms(lambda: index.classify(queries), args.repeats) / args.batch
+        print(f"{len(moods):>10} {looped:>12.3f} {single:>12.3f} {batched:>24.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_onnx_backend.py
+#
+# Compares the per-request cost of the mood analysis models on PyTorch and on the ONNX Runtime
+# backend (onnx_backend.py), fp32 and int8. A request is one sentiment call plus one text embedding
+# for a single description, as analyze_mood does; "batch" is the same work for --batch descriptions
+# in one call each, as analyze_many does, reported per text. "load" is the startup cost once the
+# ONNX graphs are cached. Run benchmarks/check_onnx_parity.py first: speed only counts if the outputs
+# match. Needs `pip install onnxruntime onnx`.
+#
+# Usage: python benchmarks/bench_onnx_backend.py [--models tiny|real] [--repeats 50] [--batch 32]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+
+def time_ms(function, repeats):
+    function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+
+def load_backend(name):
+    if name == "torch":
+        from sentence_transformers import SentenceTransformer
+        from transformers import pipeline
+
+        return (pipeline("sentiment-analysis", model=Config.SENTIMENT_MODEL, device=-1),
+                SentenceTransformer(Config.EMBEDDING_MODEL, device="cpu"))
+
+    from onnx_backend import OnnxSentenceEncoder, OnnxSentimentPipeline
+
+    quantize = name == "onnx-int8"
+    return (OnnxSentimentPipeline.load(Config.SENTIMENT_MODEL, quantize),
+            OnnxSentenceEncoder.load(Config.EMBEDDING_MODEL, quantize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mood analysis model latency: PyTorch against ONNX Runtime.")
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny",
+                        help="tiny: random stand-ins built offline; real: the checkpoints in Config")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=32, help="Texts per batched call")
+    args = parser.parse_args()
+
+    if args.models == "tiny":
+        from tiny_models import use_tiny_models
+        use_tiny_models()
+
+    from bench_suite import INPUTS
+
+    texts = (INPUTS * (args.batch // len(INPUTS) + 1))[:args.batch]
+    results = {}
+    for name in ("torch", "onnx", "onnx-int8"):
+        # Export and quantize outside the timing, so "load" is a warm start
+        load_backend(name)
+        start = time.perf_counter()
+        sentiment, encoder = load_backend(name)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        def request(text=INPUTS[0]):
+            sentiment(text)
+            encoder.encode(text)
+
+        def batch():
+            sentiment(texts, batch_size=args.batch)
+            encoder.encode(texts, batch_size=args.batch)
+
+        p50, p95 = time_ms(request, args.repeats)
+        batched = time_ms(batch, max(1, args.repeats // 10))[0] / len(texts)
+        results[name] = (load_ms, p50, p95, batched)
+
+    print(f"\n{'backend':>10} {'load (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'batch (ms/text)':>16} {'speedup':>8}")
+    for name, (load_ms, p50, p95, batched) in results.items():
+        speedup = results["torch"][1] / p50
+        print(f"{name:>10} {load_ms:>10.1f} {p50:>10.3f} {p95:>10.3f} {batched:>16.3f} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# bench_postprocessing.py
+#
+# Measures the cost of audio_processing.postprocess per second of audio for track lengths from
+# MusicGen's default 15 seconds up to long-form renders.
+#
+# Usage: python benchmarks/bench_postprocessing.py [--repeats 5]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+import audio_processing
+
+DURATIONS_SECONDS = [15, 60, 300, 900]
+
+
+def make_test_signal(seconds, sample_rate, rng):
+    """
+    A tone with noise, a DC offset and a quiet intro, roughly shaped like generated music.
+    """
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(t.size).astype(np.float32) + 0.02
+    audio[:sample_rate] *= 0.1
+    return audio.astype(np.float32)
+
+
+def run(repeats):
+    rng = np.random.default_rng(0)
+    sample_rate = Config.SAMPLING_RATE
+    results = []
+
+    for seconds in DURATIONS_SECONDS:
+        source = make_test_signal(seconds, sample_rate, rng)
+        timings = []
+        for _ in range(repeats):
+            audio = source.copy()
+            start = time.perf_counter()
+            audio_processing.postprocess(audio, sample_rate, energy_level=5)
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        results.append({
+            "audio_seconds": seconds,
+            "best_ms": round(best * 1000, 2),
+            "ms_per_audio_second": round(best * 1000 / seconds, 3),
+            "realtime_factor": round(seconds / best, 1),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audio post-processing cost per second of audio.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per duration (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'audio (s)':>10} {'best (ms)':>10} {'ms / audio s':>13} {'x realtime':>11}")
+    for row in run(args.repeats):
+        print(f"{row['audio_seconds']:>10} {row['best_ms']:>10} {row['ms_per_audio_second']:>13} {row['realtime_factor']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# bench_shared_weights.py
+#
+# Measures per-worker memory with and without Config.SHARED_WEIGHTS. Starts several worker processes
+# that load the same models and stay alive together, then reads RSS, PSS (proportional share) and
+# USS (private memory) from /proc/<pid>/smaps_rollup. With shared weights the model pages move from
+# private to shared memory, so USS and PSS per worker drop while RSS stays similar.
+#
+# By default the workers load the tiny random stand-ins from tiny_models.py, so the benchmark works
+# offline; --models real loads the checkpoints in Config instead. Compare like with like.
+#
+# Usage: python benchmarks/bench_shared_weights.py [--models tiny|real] [--workers 3] [--target musicgen|analyzer|all]
+# Linux only (needs /proc/<pid>/smaps_rollup).
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def read_memory_mb(pid="self"):
+    """
+    RSS, PSS and USS of a process in MB, from /proc/<pid>/smaps_rollup.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": fields.get("Rss", 0) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "uss_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024,
+    }
+
+
+def run_worker(target, shared, models):
+    """
+    Load the target models, report memory before and after, then wait until the parent
+    has measured every worker so the shared pages are counted while all are alive.
+    """
+    from config import Config
+    Config.SHARED_WEIGHTS = shared
+    if models == "tiny":
+        from tiny_models import use_tiny_models
+        use_tiny_models()
+
+    import torch  # noqa: F401  (imported before the baseline so it is not counted as model memory)
+    before = read_memory_mb()
+
+    loaded = []
+    if target in ("musicgen", "all"):
+        from music_generator import MusicGenerator
+        loaded.append(MusicGenerator())
+    if target in ("analyzer", "all"):
+        from mood_analyzer import MoodAnalyzer
+        loaded.append(MoodAnalyzer())
+
+    after = read_memory_mb()
+    print(json.dumps({"pid": os.getpid(), "before": before, "after": after}), flush=True)
+    sys.stdin.readline()
+
+
+def measure(target, shared, workers, models):
+    """
+    Start `workers` processes, wait for all to load, and measure them together.
+    """
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", target, "--shared", str(int(shared)),
+             "--models", models],
+            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(workers)
+    ]
+    try:
+        reports = []
+        for process in processes:
+            for line in process.stdout:
+                if line.startswith("{"):
+                    reports.append(json.loads(line))
+                    break
+        # Re-read everyone now that all workers are loaded, so PSS reflects the sharing
+        for report in reports:
+            report["together"] = read_memory_mb(report["pid"])
+    finally:
+        for process in processes:
+            if process.stdin:
+                process.stdin.write("\n")
+                process.stdin.close()
+            process.wait()
+    return reports
+
+
+def summarize(label, reports):
+    def average(key, field):
+        return sum(report[key][field] for report in reports) / len(reports)
+
+    rss_delta = average("after", "rss_mb") - average("before", "rss_mb")
+    uss_delta = average("together", "uss_mb") - average("before", "uss_mb")
+    print(f"{label:>10} {rss_delta:>16.1f} {average('together', 'pss_mb'):>14.1f} {uss_delta:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory with and without shared model weights.")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--target", choices=["musicgen", "analyzer", "all"], default="all")
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny",
+                        help="tiny: random stand-ins built offline; real: the checkpoints in Config")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--shared", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, bool(args.shared), args.models)
+        return
+
+    if args.models == "tiny":
+        # Build the stand-ins once here so the workers do not race to write them
+        from tiny_models import build_tiny_models
+        build_tiny_models()
+
+    # Export the weights once up front so the first shared run does not pay for it
+    measure(args.target, True, 1, args.models)
+
+    print(f"{args.workers} workers loading '{args.target}' with {args.models} models (averages per worker)")
+    print(f"{'weights':>10} {'RSS delta (MB)':>16} {'PSS (MB)':>14} {'USS delta (MB)':>16}")
+    summarize("private", measure(args.target, False, args.workers, args.models))
+    summarize("shared", measure(args.target, True, args.workers, args.models))
+
+
+if __name__ == "__main__":
+    main()
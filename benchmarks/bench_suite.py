@@ -0,0 +1,264 @@
+# bench_suite.py
+#
+# Per-module micro-benchmarks for the composition pipeline: mood analysis (whole and per step),
+# parameter generation, prompt building, post-processing plus MP3 export, and a full generate_music
+# run. Results are written as JSON named after the current commit, and --compare prints the change
+# against an earlier results file, so a regression shows up as a ratio instead of a feeling.
+#
+# By default the suite runs on the tiny random stand-in models from tiny_models.py, so it works
+# offline on a laptop and measures the code around the models as much as the models themselves.
+# --models real loads the checkpoints named in Config instead. Compare like with like.
+#
+# --publish-tiers also times a full composition at each quality tier and writes the latencies to
+# Config.TIER_LATENCY_FILE, which the Compose page shows next to the tier selector (real models only).
+#
+# Usage: python benchmarks/bench_suite.py [--models tiny|real] [--repeats 20] [--only classify_mood ...]
+#                                         [--output results.json] [--compare benchmarks/results/<commit>.json]
+#                                         [--publish-tiers]
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+INPUTS = [
+    "I feel happy and want some upbeat music for a summer road trip",
+    "A calm and peaceful piano piece to help me sleep",
+    "Dark mysterious atmospheric music for a night scene",
+    "Energetic workout music to pump me up",
+    "A tender romantic ballad for my love",
+    "Sad melancholy strings on a rainy morning",
+]
+
+# Wall-time regressions above this ratio (and this many ms) are flagged by --compare
+REGRESSION_THRESHOLD = 1.10
+REGRESSION_MIN_MS = 0.05
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(function, repeats, warmup=1):
+    """
+    Calls `function(i)` `warmup` times untimed, then takes `repeats` timed samples. Functions faster
+    than a millisecond are called in loops per sample, so timer resolution does not dominate.
+    Returns summary stats in ms per call.
+    """
+    start = time.perf_counter()
+    for i in range(warmup):
+        function(i)
+    first = (time.perf_counter() - start) / max(1, warmup)
+    number = min(1000, max(1, int(0.001 / first))) if first > 0 else 1000
+
+    timings = []
+    for sample in range(repeats):
+        start = time.perf_counter()
+        for i in range(sample * number, (sample + 1) * number):
+            function(i)
+        timings.append((time.perf_counter() - start) * 1000 / number)
+    timings = np.array(timings)
+    return {
+        "repeats": repeats,
+        "calls_per_sample": number,
+        "mean_ms": round(float(timings.mean()), 4),
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "min_ms": round(float(timings.min()), 4),
+    }
+
+
+def build_benchmarks(analyzer, processor, generator, duration):
+    """
+    Returns {name: (function(i), repeat divisor)}. The divisor keeps the full generation run,
+    which is orders of magnitude slower than the rest, to a handful of repeats.
+    """
+    import torch
+
+    texts = INPUTS
+    sentiments = [analyzer.sentiment_pipeline(text)[0] for text in texts]
+    base_params = [analyzer.analyze_mood(text) for text in texts]
+    params = [processor.generate_advanced_parameters(base, seed=i) for i, base in enumerate(base_params)]
+    for item in params:
+        item["duration_seconds"] = duration
+
+    generator_audio = torch.from_numpy(
+        np.random.default_rng(0).uniform(-0.5, 0.5, (1, 1, int(duration * Config.SAMPLING_RATE))).astype(np.float32)
+    )
+
+    def process_and_save(i):
+        # Post-processing works in place on the tensor's memory, so every run gets a fresh copy
+        os.remove(generator._process_and_save_audio(generator_audio.clone(), params[i % len(params)]))
+
+    def generate(i):
+        os.remove(generator.generate_music(dict(params[i % len(params)])))
+
+    return {
+        "analyze_mood": (lambda i: analyzer.analyze_mood(texts[i % len(texts)]), 1),
+        "classify_mood": (lambda i: analyzer.classify_mood(texts[i % len(texts)]), 1),
+        "extract_energy_level": (
+            lambda i: analyzer.extract_energy_level(texts[i % len(texts)], sentiments[i % len(texts)]), 1
+        ),
+        "generate_advanced_parameters": (
+            lambda i: processor.generate_advanced_parameters(base_params[i % len(texts)], seed=i), 1
+        ),
+        "create_prompt": (lambda i: generator._create_prompt(params[i % len(params)]), 1),
+        "process_and_save_audio": (process_and_save, 4),
+        "generate_music": (generate, 10),
+    }
+
+
+def time_tiers(analyzer, processor, generator, repeats):
+    """
+    Times generate_music end to end at every quality tier, each at the tier's own length.
+    Returns {tier: {settings..., "p50_seconds", "p95_seconds"}}.
+    """
+    from quality_tiers import get_tier, tier_names
+
+    base_params = processor.generate_advanced_parameters(analyzer.analyze_mood(INPUTS[0]), seed=0)
+    tiers = {}
+    for name in tier_names():
+        tier = get_tier(name)
+
+        def generate(i):
+            os.remove(generator.generate_music(dict(base_params, quality_tier=name, seed=i)))
+
+        stats = measure(generate, repeats)
+        tiers[name] = {
+            "model": tier["model"],
+            "duration_seconds": tier["duration_seconds"],
+            "guidance_scale": tier["guidance_scale"],
+            "bitrate": tier["bitrate"],
+            "p50_seconds": round(stats["p50_ms"] / 1000, 3),
+            "p95_seconds": round(stats["p95_ms"] / 1000, 3),
+            "repeats": repeats,
+        }
+        print(f"{'tier ' + name:>30} {stats['mean_ms']:>12.3f} {stats['p50_ms']:>12.3f} {stats['p95_ms']:>12.3f}")
+    return tiers
+
+
+def publish_tiers(results):
+    """
+    Writes the tier latencies of this run to Config.TIER_LATENCY_FILE for the Compose page.
+    """
+    path = Config.TIER_LATENCY_FILE
+    if not os.path.isabs(path):
+        path = os.path.join(ROOT, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    published = {key: results[key] for key in ("commit", "time", "models", "platform", "cpu_count", "torch_threads")}
+    published["tiers"] = results["tiers"]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(published, f, indent=2)
+    print(f"✅ Tier latencies published to {path}")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("models") != results["models"]:
+        print(f"⚠️ Baseline used {baseline.get('models')} models, this run {results['models']}")
+
+    print(f"\nAgainst {baseline.get('commit')} ({baseline_path}):")
+    print(f"{'benchmark':>30} {'before (ms)':>12} {'after (ms)':>12} {'ratio':>8}")
+    for name, current in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            print(f"{name:>30} {'-':>12} {current['p50_ms']:>12.3f} {'new':>8}")
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"] if previous["p50_ms"] else float("inf")
+        regressed = ratio > REGRESSION_THRESHOLD and current["p50_ms"] - previous["p50_ms"] > REGRESSION_MIN_MS
+        marker = " ⚠️" if regressed else ""
+        print(f"{name:>30} {previous['p50_ms']:>12.3f} {current['p50_ms']:>12.3f} {ratio:>7.2f}x{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module micro-benchmarks written to JSON.")
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny",
+                        help="tiny: random stand-ins built offline; real: the checkpoints in Config")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed samples per benchmark (fewer for the slow ones)")
+    parser.add_argument("--duration", type=float, default=Config.AUDIO_DURATION_SECONDS,
+                        help="Seconds of audio for post-processing and generation")
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>-<models>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--publish-tiers", action="store_true",
+                        help="Also time each quality tier and write the latencies to Config.TIER_LATENCY_FILE")
+    args = parser.parse_args()
+
+    if args.models == "tiny":
+        from tiny_models import use_tiny_models
+        use_tiny_models()
+        # Every tier runs on the tiny checkpoint; the timings still reflect guidance, length and bitrate
+        for tier in Config.QUALITY_TIERS.values():
+            tier["model"] = None
+    # Repeated runs must do the work every time and at the requested length
+    Config.GENERATION_CACHE_ENABLED = False
+    Config.LIBRARY_ENABLED = False
+    Config.ANALYSIS_CACHE_ENABLED = False
+    Config.LATENCY_SLO_ENABLED = False
+
+    import torch
+    from mood_analyzer import MoodAnalyzer
+    from music_parameters import MusicParameterProcessor
+    from music_generator import MusicGenerator
+
+    analyzer = MoodAnalyzer()
+    processor = MusicParameterProcessor()
+    generator = MusicGenerator()
+
+    benchmarks = build_benchmarks(analyzer, processor, generator, args.duration)
+    results = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "models": args.models,
+        "model_names": [Config.SENTIMENT_MODEL, Config.EMBEDDING_MODEL, Config.MUSIC_GEN_MODEL],
+        "duration_seconds": args.duration,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "benchmarks": {},
+    }
+
+    print(f"{'benchmark':>30} {'mean (ms)':>12} {'p50 (ms)':>12} {'p95 (ms)':>12}")
+    for name, (function, divisor) in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        stats = measure(function, max(1, args.repeats // divisor))
+        results["benchmarks"][name] = stats
+        print(f"{name:>30} {stats['mean_ms']:>12.3f} {stats['p50_ms']:>12.3f} {stats['p95_ms']:>12.3f}")
+
+    if args.publish_tiers:
+        results["tiers"] = time_tiers(analyzer, processor, generator, max(1, args.repeats // 10))
+        publish_tiers(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}-{args.models}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
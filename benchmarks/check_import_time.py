@@ -0,0 +1,85 @@
+# check_import_time.py
+#
+# Import-time budget check for the modules the Streamlit pages import. Each run cold-imports them
+# in a fresh interpreter and fails if the import takes longer than the budget or pulls in one of
+# the heavy model stacks, which must only be imported when models are actually loaded.
+#
+# Usage: python benchmarks/check_import_time.py [--budget 0.25] [--runs 3]
+# Exits with status 1 when the budget is exceeded.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGE_MODULES = [
+    "config", "mood_analyzer", "music_parameters", "music_generator",
+    "generation_batcher", "model_loader", "job_client",
+]
+# Only importable where streamlit is installed
+STREAMLIT_MODULES = ["auth", "ui_utils"]
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "sklearn", "scipy", "pandas", "pydub"]
+
+PROBE = """
+import json, sys, time
+try:
+    import streamlit  # imported by every page anyway, so it is not part of the budget
+    modules = {page_modules} + {streamlit_modules}
+except ImportError:
+    modules = {page_modules}
+import numpy  # baseline dependency shared with streamlit
+
+start = time.perf_counter()
+for name in modules:
+    __import__(name)
+elapsed = time.perf_counter() - start
+
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": modules,
+    "heavy": [name for name in {heavy_modules} if name in sys.modules],
+}}))
+"""
+
+
+def measure_once():
+    code = PROBE.format(
+        page_modules=PAGE_MODULES, streamlit_modules=STREAMLIT_MODULES, heavy_modules=HEAVY_MODULES
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Import probe failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if cold import of the page modules regresses.")
+    parser.add_argument("--budget", type=float, default=0.25, help="Maximum cold import time in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to try; the best run counts")
+    args = parser.parse_args()
+
+    results = [measure_once() for _ in range(args.runs)]
+    best = min(results, key=lambda result: result["seconds"])
+    heavy = sorted({name for result in results for name in result["heavy"]})
+
+    print(f"Imported: {', '.join(best['modules'])}")
+    print(f"Cold import time: {best['seconds'] * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"🔥 Heavy modules imported at module level: {', '.join(heavy)}")
+        failed = True
+    if best["seconds"] > args.budget:
+        print("🔥 Import time budget exceeded")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Import time within budget")
+
+
+if __name__ == "__main__":
+    main()
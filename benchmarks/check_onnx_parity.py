@@ -0,0 +1,116 @@
+# check_onnx_parity.py
+#
+# Checks that the ONNX Runtime backend (onnx_backend.py) agrees with the PyTorch models it was
+# exported from, on the benchmark inputs plus every mood descriptor phrase:
+#   - sentiment: same label for every text, and the label's score within --score-tolerance
+#   - embeddings: cosine similarity of each ONNX vector with the PyTorch one at least --min-cosine
+#   - moods: same mood for every text when each backend classifies against its own prototypes
+# int8 quantization changes the numbers slightly, so --int8 uses looser default tolerances and only
+# requires --min-agreement of the labels and moods to match. Exits with status 1 on a mismatch, so
+# it can gate a switch of Config.NLP_BACKEND or a model change. Needs `pip install onnxruntime onnx`.
+#
+# Usage: python benchmarks/check_onnx_parity.py [--models tiny|real] [--int8] [--min-cosine 0.9999]
+#                                               [--score-tolerance 0.001] [--min-agreement 1.0]
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+# (min cosine, score tolerance, min label/mood agreement) per precision
+TOLERANCES = {"fp32": (0.9999, 0.001, 1.0), "int8": (0.98, 0.05, 0.95)}
+
+
+def parity_texts():
+    from bench_suite import INPUTS
+    from mood_analyzer import load_mood_descriptions
+
+    phrases = [phrase for mood_phrases in load_mood_descriptions().values() for phrase in mood_phrases]
+    return list(dict.fromkeys(INPUTS + phrases))
+
+
+def cosine(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=-1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=-1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the ONNX Runtime backend against PyTorch.")
+    parser.add_argument("--models", choices=["tiny", "real"], default="tiny",
+                        help="tiny: random stand-ins built offline; real: the checkpoints in Config")
+    parser.add_argument("--int8", action="store_true", help="Check the int8 quantized export")
+    parser.add_argument("--min-cosine", type=float, help="Lowest accepted embedding cosine similarity")
+    parser.add_argument("--score-tolerance", type=float, help="Largest accepted sentiment score difference")
+    parser.add_argument("--min-agreement", type=float, help="Fraction of sentiment labels and moods that must match")
+    args = parser.parse_args()
+
+    precision = "int8" if args.int8 else "fp32"
+    min_cosine, score_tolerance, min_agreement = TOLERANCES[precision]
+    min_cosine = args.min_cosine if args.min_cosine is not None else min_cosine
+    score_tolerance = args.score_tolerance if args.score_tolerance is not None else score_tolerance
+    min_agreement = args.min_agreement if args.min_agreement is not None else min_agreement
+
+    if args.models == "tiny":
+        from tiny_models import use_tiny_models
+        use_tiny_models()
+
+    from sentence_transformers import SentenceTransformer
+    from transformers import pipeline
+    from mood_analyzer import load_mood_descriptions
+    from mood_index import MoodPrototypeIndex
+    from onnx_backend import OnnxSentenceEncoder, OnnxSentimentPipeline
+
+    torch_sentiment = pipeline("sentiment-analysis", model=Config.SENTIMENT_MODEL, device=-1)
+    torch_encoder = SentenceTransformer(Config.EMBEDDING_MODEL, device="cpu")
+    onnx_sentiment = OnnxSentimentPipeline.load(Config.SENTIMENT_MODEL, quantize=args.int8)
+    onnx_encoder = OnnxSentenceEncoder.load(Config.EMBEDDING_MODEL, quantize=args.int8)
+
+    texts = parity_texts()
+    descriptions = load_mood_descriptions()
+    print(f"Checking {precision} ONNX against PyTorch on {len(texts)} texts ({args.models} models)")
+
+    torch_labels = torch_sentiment(texts)
+    onnx_labels = onnx_sentiment(texts)
+    label_matches = [a["label"] == b["label"] for a, b in zip(torch_labels, onnx_labels)]
+    score_error = max(
+        abs(a["score"] - b["score"]) for a, b, same in zip(torch_labels, onnx_labels, label_matches) if same
+    ) if any(label_matches) else float("inf")
+
+    torch_embeddings = torch_encoder.encode(texts)
+    onnx_embeddings = onnx_encoder.encode(texts)
+    similarities = cosine(torch_embeddings, onnx_embeddings)
+
+    torch_moods = MoodPrototypeIndex.build(torch_encoder, descriptions).best(torch_embeddings)
+    onnx_moods = MoodPrototypeIndex.build(onnx_encoder, descriptions).best(onnx_embeddings)
+    mood_matches = [a == b for a, b in zip(torch_moods, onnx_moods)]
+
+    checks = [
+        ("sentiment labels", np.mean(label_matches), f">= {min_agreement:.2%}", np.mean(label_matches) >= min_agreement),
+        ("sentiment score error", score_error, f"<= {score_tolerance}", score_error <= score_tolerance),
+        ("embedding cosine (min)", similarities.min(), f">= {min_cosine}", similarities.min() >= min_cosine),
+        ("mood labels", np.mean(mood_matches), f">= {min_agreement:.2%}", np.mean(mood_matches) >= min_agreement),
+    ]
+    for name, value, limit, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name:>24}: {value:.6f} (limit {limit})")
+
+    for text, a, b in zip(texts, torch_labels, onnx_labels):
+        if a["label"] != b["label"]:
+            print(f"   sentiment differs for {text!r}: {a['label']} vs {b['label']}")
+    for text, a, b in zip(texts, torch_moods, onnx_moods):
+        if a != b:
+            print(f"   mood differs for {text!r}: {a} vs {b}")
+
+    if not all(passed for _, _, _, passed in checks):
+        sys.exit(1)
+    print("✅ ONNX backend matches PyTorch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# tiny_models.py
+#
+# Builds tiny randomly initialized stand-ins for the three models the app loads (sentiment
+# classifier, sentence embedder, MusicGen) and saves them as ordinary local checkpoints. Pointing
+# Config.SENTIMENT_MODEL, EMBEDDING_MODEL and MUSIC_GEN_MODEL at them runs the real loading and
+# inference code paths offline in seconds, which is what the benchmark suite needs to compare
+# commits on a laptop. Their output is noise: use them for timing, never for listening.
+#
+# Usage: python benchmarks/tiny_models.py [--dir benchmarks/tiny_models]
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+DEFAULT_DIR = os.path.join(ROOT, "benchmarks", "tiny_models")
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "</s>"]
+
+# Words of the mood descriptions, prompt template and benchmark inputs, so the word-level
+# tokenizer produces sequences of realistic length instead of mostly [UNK]
+VOCABULARY = """
+a an the and with of in is for to it my me i feel feeling want some music song track piece mood
+joyful cheerful upbeat positive energetic bright melancholy sorrowful depressed gloomy downcast
+peaceful tranquil serene relaxed meditative quiet dynamic powerful intense vigorous exciting
+enigmatic dark atmospheric suspenseful eerie loving tender passionate intimate gentle warm
+happy sad calm mysterious romantic excited pump workout dance party fast sleep meditate soft slow
+high low medium energy tempo approximately bpm prominent instruments include features rhythm texture
+major minor natural harmonic dorian mixolydian lydian pentatonic aeolian phrygian locrian blues
+straight swing rubato legato sustained staccato syncopated irregular sparse waltz ballad
+monophonic homophonic polyphonic piano guitar drums strings cello flute violin synth bass pad
+pop rock jazz classical ambient electronic folk cinematic lofi orchestral acoustic
+rainy morning night summer road trip study focus love heartbreak epic adventure
+""".split()
+
+MODEL_NAMES = {"sentiment": "sentiment", "embedding": "embedding", "musicgen": "musicgen"}
+
+
+def _tokenizer(template):
+    """
+    Word-level fast tokenizer over VOCABULARY. `template` is "bert" ([CLS] ... [SEP]) or "t5" (... </s>).
+    """
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {token: index for index, token in enumerate(SPECIAL_TOKENS + sorted(set(VOCABULARY)))}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    if template == "bert":
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="[CLS] $A [SEP]", special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])]
+        )
+    else:
+        tokenizer.post_processor = processors.TemplateProcessing(
+            single="$A </s>", special_tokens=[("</s>", vocab["</s>"])]
+        )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]",
+        sep_token="[SEP]", eos_token="</s>", model_max_length=256
+    ), len(vocab)
+
+
+def build_tiny_models(directory=DEFAULT_DIR):
+    """
+    Creates the tiny checkpoints under `directory` unless they already exist.
+    Returns {"sentiment": path, "embedding": path, "musicgen": path}.
+    """
+    paths = {key: os.path.join(directory, name) for key, name in MODEL_NAMES.items()}
+    if all(os.path.exists(os.path.join(path, "config.json")) for path in paths.values()):
+        return paths
+
+    import torch
+    from transformers import (BertConfig, BertForSequenceClassification, BertModel, EncodecConfig,
+                              EncodecFeatureExtractor, MusicgenConfig, MusicgenForConditionalGeneration,
+                              MusicgenProcessor, T5Config)
+    from transformers.models.musicgen.configuration_musicgen import MusicgenDecoderConfig
+
+    torch.manual_seed(0)
+    bert_tokenizer, vocab_size = _tokenizer("bert")
+    bert_config = BertConfig(
+        vocab_size=vocab_size, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=256, num_labels=3
+    )
+    # Three labels named LABEL_0..LABEL_2, like the negative/neutral/positive sentiment model
+    BertForSequenceClassification(bert_config).save_pretrained(paths["sentiment"])
+    bert_tokenizer.save_pretrained(paths["sentiment"])
+    BertModel(bert_config).save_pretrained(paths["embedding"])
+    bert_tokenizer.save_pretrained(paths["embedding"])
+
+    t5_tokenizer, vocab_size = _tokenizer("t5")
+    text_encoder = T5Config(
+        vocab_size=vocab_size, d_model=16, d_kv=8, d_ff=32, num_layers=1, num_heads=2,
+        pad_token_id=t5_tokenizer.pad_token_id, eos_token_id=t5_tokenizer.eos_token_id
+    )
+    # Same frame rate (50 Hz at 32 kHz) and codebook layout as musicgen-small, far fewer weights
+    audio_encoder = EncodecConfig(
+        hidden_size=16, num_filters=4, num_residual_layers=1, upsampling_ratios=[8, 5, 4, 4],
+        codebook_size=64, codebook_dim=16, sampling_rate=32000, audio_channels=1,
+        target_bandwidths=[1.2], num_lstm_layers=1
+    )
+    decoder = MusicgenDecoderConfig(
+        vocab_size=64, hidden_size=16, num_hidden_layers=1, ffn_dim=32, num_attention_heads=2,
+        num_codebooks=4, pad_token_id=64, decoder_start_token_id=64, bos_token_id=64
+    )
+    model = MusicgenForConditionalGeneration(MusicgenConfig(
+        text_encoder=text_encoder.to_dict(), audio_encoder=audio_encoder.to_dict(), decoder=decoder.to_dict()
+    ))
+    generation_config = model.generation_config
+    generation_config.pad_token_id = 64
+    generation_config.decoder_start_token_id = 64
+    generation_config.do_sample = True
+    generation_config.top_k = 250
+    generation_config.guidance_scale = 3.0
+    generation_config.max_length = 1500
+    model.save_pretrained(paths["musicgen"])
+    MusicgenProcessor(
+        feature_extractor=EncodecFeatureExtractor(feature_size=1, sampling_rate=32000), tokenizer=t5_tokenizer
+    ).save_pretrained(paths["musicgen"])
+
+    print(f"✅ Tiny models written to {directory}")
+    return paths
+
+
+def use_tiny_models(directory=DEFAULT_DIR):
+    """
+    Builds the tiny models if needed and points Config at them.
+    """
+    from config import Config
+
+    paths = build_tiny_models(directory)
+    Config.SENTIMENT_MODEL = paths["sentiment"]
+    Config.EMBEDDING_MODEL = paths["embedding"]
+    Config.MUSIC_GEN_MODEL = paths["musicgen"]
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build tiny randomly initialized stand-in models.")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Where to write the checkpoints")
+    args = parser.parse_args()
+    for key, path in build_tiny_models(args.dir).items():
+        print(f"{key:>10}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# build_library.py
+#
+# Offline builder for the pre-rendered track library. Enumerates the blueprint space defined by
+# MusicParameterProcessor.create_music_theory_mappings (mood × energy band × key × scale × rhythm),
+# optionally samples it, and renders tracks for it on a pool of worker processes, each running its
+# own MusicGenerator on a share of the CPU cores. Finished tracks are indexed in the TrackLibrary.
+#
+# Runs are resumable: blueprints that already have enough fresh variants are skipped, so an
+# interrupted overnight build continues where it stopped and a re-run only renders expired tracks.
+#
+# Usage: python build_library.py [--moods happy calm] [--sample 100] [--variants 2] [--workers N] [--dry-run]
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+from config import Config
+from track_library import TrackLibrary
+
+# Representative energy level for each band used by the prompt (see track_library.energy_band)
+ENERGY_BANDS = {"low": 2, "medium": 5, "high": 8}
+NEUTRAL_SENTIMENT = {"label": "LABEL_1", "score": 0.5}
+
+_generator = None
+
+
+def enumerate_blueprints(moods=None):
+    """
+    All (mood, energy band, key, scale, rhythm) combinations of the parameter processor's mappings.
+    """
+    from music_parameters import MusicParameterProcessor
+
+    mappings = MusicParameterProcessor().mood_theory_mappings
+    blueprints = []
+    for mood, mapping in mappings.items():
+        if moods and mood not in moods:
+            continue
+        blueprints.extend(itertools.product(
+            [mood], ENERGY_BANDS, mapping["typical_keys"], mapping["scales"], mapping["rhythmic_patterns"]
+        ))
+    return blueprints
+
+
+def make_params(blueprint, seed):
+    """
+    Full composition parameters for a blueprint, built the way the Compose page builds them
+    (rule-based mapping only, no NLP models) and then pinned to the blueprint's choices.
+    """
+    from mood_analyzer import MoodAnalyzer
+    from music_parameters import MusicParameterProcessor
+
+    mood, band, key, scale, rhythm = blueprint
+    analyzer = MoodAnalyzer.__new__(MoodAnalyzer)
+    base = analyzer.generate_musical_parameters(mood, ENERGY_BANDS[band], NEUTRAL_SENTIMENT)
+    params = MusicParameterProcessor().generate_advanced_parameters(base, seed=seed)
+    params.update(
+        suggested_key=key,
+        scale_type=scale,
+        rhythmic_pattern=rhythm,
+        duration_seconds=Config.AUDIO_DURATION_SECONDS,
+    )
+    return params
+
+
+def _init_worker(threads):
+    """
+    Load one MusicGenerator per worker process. Library serving, the generation cache and the
+    latency budget are turned off so every task renders a full-length track.
+    """
+    global _generator
+    import torch
+
+    torch.set_num_threads(threads)
+    Config.GENERATION_CACHE_ENABLED = False
+    Config.LIBRARY_ENABLED = False
+    Config.LATENCY_SLO_ENABLED = False
+
+    from music_generator import MusicGenerator
+    _generator = MusicGenerator()
+
+
+def _render(params):
+    start = time.perf_counter()
+    try:
+        path = _generator.generate_music(params)
+    except Exception as e:
+        return params, None, time.perf_counter() - start, str(e)
+    return params, path, time.perf_counter() - start, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render tracks for the blueprint space into the track library.")
+    parser.add_argument("--moods", nargs="+", help="Only build these moods (default: all)")
+    parser.add_argument("--sample", type=int, default=0, help="Render a random sample of this many blueprints (0: all)")
+    parser.add_argument("--variants", type=int, default=2, help="Fresh tracks wanted per blueprint")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="Worker processes, each with its own model")
+    parser.add_argument("--library", default=Config.LIBRARY_DIR, help="Library directory")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for sampling and composition seeds")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be rendered")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    blueprints = enumerate_blueprints(args.moods)
+    if args.sample and args.sample < len(blueprints):
+        blueprints = [blueprints[i] for i in sorted(rng.choice(len(blueprints), args.sample, replace=False))]
+
+    library = TrackLibrary(args.library)
+    tasks = []
+    for blueprint in blueprints:
+        missing = args.variants - library.count(blueprint)
+        tasks.extend(make_params(blueprint, int(rng.integers(2**31))) for _ in range(max(0, missing)))
+
+    print(f"🎵 {len(blueprints)} blueprints, {len(tasks)} tracks to render "
+          f"({args.variants} variants each, {args.workers} workers)")
+    if args.dry_run or not tasks:
+        return
+
+    import multiprocessing
+
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    start = time.perf_counter()
+    failed = 0
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        for done, (params, path, seconds, error) in enumerate(pool.imap_unordered(_render, tasks), 1):
+            label = "/".join(str(field) for field in (params["mood_category"], params["suggested_key"],
+                                                      params["scale_type"], params["rhythmic_pattern"]))
+            if error:
+                failed += 1
+                print(f"⚠️ [{done}/{len(tasks)}] {label} failed: {error}")
+                continue
+            library.add(params, path)
+            print(f"✅ [{done}/{len(tasks)}] {label} in {seconds:.1f}s")
+
+    elapsed = time.perf_counter() - start
+    stats = library.stats()
+    print(f"🔥 Rendered {len(tasks) - failed} tracks in {elapsed / 60:.1f} min ({failed} failed). "
+          f"Library: {stats['tracks']} tracks over {stats['blueprints']} blueprints")
+
+
+if __name__ == "__main__":
+    main()
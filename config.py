@@ -1,4 +1,5 @@
 # config.py
+import os
 
 class Config:
     # --- NLP Models ---
@@ -8,11 +9,143 @@ class Config:
     # --- Music Generation Model ---
     MUSIC_GEN_MODEL = "facebook/musicgen-small"
 
+    # --- Mood Analysis ---
+    ANALYSIS_BATCH_SIZE = 32  # Texts per sentiment / embedding batch in MoodAnalyzer.analyze_many
+    MOOD_PROTOTYPES_FILE = None  # Optional JSON {mood: [descriptor phrase, ...]} adding mood prototypes
+    MOOD_PROTOTYPE_CACHE_DIR = "cache/prototypes"  # Saved prototype embeddings, memory-mapped at startup (None: always encode)
+    MOOD_TOP_K = 3  # Moods listed by MoodAnalyzer.classify_mood_scores
+    MOOD_SOFTMAX_TEMPERATURE = 0.05  # Lower values concentrate the soft mood weights on the best match
+    # "torch" or "onnx": ONNX Runtime for the sentiment and embedding models (pip install onnxruntime onnx).
+    # Run benchmarks/check_onnx_parity.py and benchmarks/bench_onnx_backend.py before switching.
+    NLP_BACKEND = "torch"
+    ONNX_QUANTIZE_INT8 = False  # int8 dynamic quantization of the exported weights
+    ONNX_CACHE_DIR = "cache/onnx"  # Exported graphs and their tokenizers
+
+    # --- Analysis Cache ---
+    # Mood analysis results per normalized description (case and whitespace folded), kept in memory
+    # and in SQLite across restarts. Entries are keyed by the model names, so changing a model starts fresh.
+    ANALYSIS_CACHE_ENABLED = True
+    ANALYSIS_CACHE_PATH = "cache/analysis.db"
+    ANALYSIS_CACHE_MEMORY_ENTRIES = 1024
+    ANALYSIS_CACHE_DISK_ENTRIES = 100000
+
     # --- Generation Parameters ---
     MAX_LENGTH = 128
     AUDIO_DURATION_SECONDS = 15  # Set to 15 seconds for faster generation
     SAMPLING_RATE = 32000  # MusicGen's native sampling rate
 
+    # --- Quality Tiers ---
+    # Cost profiles offered on the Compose page. Each bundles the checkpoint (None: MUSIC_GEN_MODEL),
+    # the track length (None: AUDIO_DURATION_SECONDS), classifier-free guidance (a guidance_scale of 1
+    # turns it off and halves the decoder batch), the sampling settings and the MP3 bitrate. Tiers with
+    # latency_budget off always get their full length instead of being shortened under load.
+    # Run benchmarks/bench_suite.py --publish-tiers to measure the latency shown for each tier.
+    QUALITY_TIERS = {
+        "draft": {
+            "label": "Draft", "description": "Quick sketch: shorter, no guidance, lower bitrate",
+            "model": None, "duration_seconds": 8, "guidance_scale": 1.0,
+            "do_sample": True, "top_k": 250, "temperature": 1.0,
+            "bitrate": "96k", "latency_budget": True,
+        },
+        "standard": {
+            "label": "Standard", "description": "Balanced quality and speed",
+            "model": None, "duration_seconds": None, "guidance_scale": 3.0,
+            "do_sample": True, "top_k": 250, "temperature": 1.0,
+            "bitrate": "192k", "latency_budget": True,
+        },
+        "high": {
+            "label": "High", "description": "Larger model, full 30 seconds, highest bitrate",
+            "model": "facebook/musicgen-medium", "duration_seconds": 30, "guidance_scale": 3.0,
+            "do_sample": True, "top_k": 250, "temperature": 1.0,
+            "bitrate": "320k", "latency_budget": False,
+        },
+    }
+    DEFAULT_QUALITY_TIER = "standard"
+    TIER_LATENCY_FILE = "benchmarks/tier_latency.json"  # Written by bench_suite.py --publish-tiers
+
+    # --- Audio Post-Processing ---
+    TARGET_LOUDNESS_LUFS = -14.0  # Loudness target at maximum energy
+    PEAK_CEILING_DBFS = -1.0  # Loudness gain never pushes the peak above this level
+    FADE_IN_SECONDS = 0.05
+    FADE_OUT_SECONDS = 0.5
+
+    # --- Long-Form Generation ---
+    LONGFORM_WINDOW_SECONDS = 15  # Audio generated per window, including the conditioning context
+    LONGFORM_CONTEXT_SECONDS = 5  # Tail of the previous window each new window continues from
+    LONGFORM_CROSSFADE_SECONDS = 1.0  # Equal-power crossfade between consecutive windows
+    LONGFORM_MAX_SECONDS = 300
+
+    # --- Text Encoder Cache ---
+    ENCODER_CACHE_ENABLED = True  # Reuse tokenized prompts and T5 encoder outputs across requests
+    ENCODER_CACHE_MB = 32  # In-memory LRU budget for cached encoder outputs
+
+    # --- Pre-rendered Track Library ---
+    # Built offline with build_library.py; matching blueprints are served from it without generation.
+    LIBRARY_ENABLED = True
+    LIBRARY_DIR = "library"
+    LIBRARY_MAX_AGE_DAYS = 30  # Older tracks are no longer served; rebuild to refresh them
+    LIBRARY_MAX_SERVES = 20  # Each track is served at most this many times before fresh ones are generated
+
+    # --- Latency SLO ---
+    # Shorten tracks under load so that the p95 latency of a composition stays within the target.
+    # Each decision is logged with the measured tokens/s and queue depth.
+    LATENCY_SLO_ENABLED = True
+    LATENCY_TARGET_P95_SECONDS = 90.0
+    MIN_AUDIO_DURATION_SECONDS = 5  # Hard floor, even when the target cannot be met
+
+    # --- Dynamic Batching ---
+    BATCH_MAX_SIZE = 4  # Max number of requests merged into one generate call
+    BATCH_MAX_WAIT_SECONDS = 0.25  # How long the first request waits for others to join
+
+    # --- Encoding Pool ---
+    ENCODE_WORKERS = 2  # Parallel ffmpeg encoders
+    ENCODE_MAX_PENDING = 8  # Submissions block once this many encodes are queued or running
+
+    # --- Streaming Playback ---
+    STREAMING_PLAYBACK = True  # Play the first chunks on the Compose page while the rest is generated (when batched alone)
+    STREAM_CHUNK_SECONDS = 2.0  # Seconds of audio decoded per streamed chunk
+
+    # --- Generation Cache ---
+    GENERATION_CACHE_ENABLED = True
+    GENERATION_CACHE_DIR = "cache/generation"
+    GENERATION_CACHE_MEMORY_MB = 64  # In-memory LRU budget for encoded tracks
+    GENERATION_CACHE_DISK_MB = 1024  # Size cap of the on-disk store
+
+    # --- Job Server ---
+    # Base URL of job_server.py (e.g. "http://127.0.0.1:8765"). When unset, the Compose page generates inline.
+    JOB_SERVER_URL = os.environ.get("MELODAI_JOB_SERVER_URL")
+    JOB_SERVER_HOST = "127.0.0.1"
+    JOB_SERVER_PORT = 8765
+    JOB_DB_PATH = "jobs.db"  # Persistent job queue
+    JOB_WORKERS = 1  # Jobs generated concurrently by one server process
+    JOB_POLL_SECONDS = 1.0  # How often idle workers and the Compose page check for updates
+
+    # --- Metrics ---
+    # Per-stage timings and counters in the Prometheus text format. The job server serves them at
+    # /metrics; the Streamlit app rewrites METRICS_FILE after every composition (unset it to skip).
+    METRICS_ENABLED = True
+    METRICS_FILE = os.environ.get("MELODAI_METRICS_FILE", "metrics.prom")
+
+    # --- Memory Accounting ---
+    # Per-request RSS (before, after, peak) for mood analysis and generation, logged with the request
+    # id to MEMORY_LOG_FILE and exported with the metrics. Off by default: it samples RSS in a thread.
+    MEMORY_TRACKING = os.environ.get("MELODAI_MEMORY_TRACKING") == "1"
+    MEMORY_SAMPLE_SECONDS = 0.02
+    MEMORY_TRACEMALLOC = False  # Also record the largest Python allocations (slows allocation-heavy code)
+    MEMORY_TOP_ALLOCATIONS = 5
+    MEMORY_LOG_FILE = "memory.jsonl"
+
     # --- System ---
     # DEVICE = "cuda" # Change to "cpu" if you don't have a GPU
-    DEVICE = "cpu" 
\ No newline at end of file
+    DEVICE = "cpu"
+    # Full path to ffmpeg (e.g. "C:\\ffmpeg\\bin\\ffmpeg.exe"). When unset, ffmpeg is looked up on PATH.
+    FFMPEG_PATH = os.environ.get("MELODAI_FFMPEG_PATH")
+    # Back model weights with memory-mapped safetensors files shared by all server processes (CPU only).
+    # Run benchmarks/bench_shared_weights.py to measure the per-worker memory saving.
+    SHARED_WEIGHTS = False
+    SHARED_WEIGHTS_DIR = "cache/weights"
+    # Start loading the AI models in a background thread as soon as the app starts (not with a job server)
+    PRELOAD_MODELS = True
+    # CPU inference mode: "fp32", "int8" (dynamic quantization of decoder linears) or "bf16" (autocast).
+    # Run benchmarks/bench_inference_modes.py to compare speed, memory and output similarity.
+    INFERENCE_MODE = "fp32" 
\ No newline at end of file
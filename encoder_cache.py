@@ -0,0 +1,70 @@
+# encoder_cache.py
+#
+# This module defines the EncoderCache class, an in-memory LRU of MusicGen's text conditioning.
+# Prompts come from a small template space, so the same prompt is tokenized and run through the
+# T5 text encoder again and again. Caching the token ids and encoder hidden states per prompt lets
+# `generate` start decoding straight away.
+
+import threading
+from collections import OrderedDict
+
+from config import Config
+
+
+class EncoderCache:
+    """
+    LRU cache of {"input_ids", "attention_mask", "last_hidden_state"} tensors keyed by (checkpoint, prompt),
+    evicted by total tensor size.
+    """
+    def __init__(self, memory_limit_mb=None):
+        self.memory_limit = int((memory_limit_mb or Config.ENCODER_CACHE_MB) * 1024 * 1024)
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry_bytes(entry):
+        return sum(tensor.element_size() * tensor.nelement() for tensor in entry.values())
+
+    def get(self, prompt):
+        """
+        Returns the cached tensors for `prompt`, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(prompt)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(prompt)
+            self.hits += 1
+            return entry
+
+    def put(self, prompt, entry):
+        """
+        Stores the tensors for `prompt`, evicting least recently used prompts to stay within budget.
+        """
+        size = self._entry_bytes(entry)
+        if size > self.memory_limit:
+            return
+        with self._lock:
+            previous = self._entries.pop(prompt, None)
+            if previous is not None:
+                self._memory_bytes -= self._entry_bytes(previous)
+            self._entries[prompt] = entry
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_limit:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= self._entry_bytes(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+            }
@@ -0,0 +1,108 @@
+# encoding_pool.py
+#
+# This module defines the EncodingPool class, a bounded thread pool that runs post-processing and
+# MP3 encoding off the generation thread so the shared MusicGen model can start the next request.
+# Queue depth, queue wait and encode latency are published through `metrics`, so they appear in the
+# job server's /metrics and in Config.METRICS_FILE.
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import Config
+from metrics import metrics
+
+metrics.describe("melodai_encoding_queue_depth", "gauge", "Encode jobs waiting for an encoding pool worker.")
+metrics.describe("melodai_encoding_in_flight", "gauge", "Encode jobs running on the encoding pool.")
+metrics.describe("melodai_encoding_queue_wait_seconds", "histogram", "Time encode jobs waited for a worker.")
+metrics.describe("melodai_encode_duration_seconds", "histogram", "Post-processing and MP3 encoding time per job.")
+metrics.describe("melodai_encodes_total", "counter", "Finished encode jobs, by outcome.")
+
+
+class EncodingPool:
+    """
+    Runs encode jobs on a small thread pool and returns Futures.
+    The heavy lifting happens in an ffmpeg subprocess, so threads do not contend for the GIL.
+    Submissions block once `max_pending` jobs are queued or running, which keeps memory bounded.
+    """
+    def __init__(self, max_workers=None, max_pending=None, latency_window=200):
+        self.max_workers = max_workers or Config.ENCODE_WORKERS
+        self.max_pending = max_pending or Config.ENCODE_MAX_PENDING
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="melodai-encoder")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._queue_waits = deque(maxlen=latency_window)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` for encoding and return a Future with its result.
+        """
+        self._slots.acquire()
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+            self._publish_depth()
+
+        def job():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+                self._queue_waits.append(started_at - submitted_at)
+                self._publish_depth()
+            metrics.observe("melodai_encoding_queue_wait_seconds", started_at - submitted_at)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                metrics.inc("melodai_encodes_total", {"status": "failed"})
+                raise
+            else:
+                with self._lock:
+                    self._completed += 1
+                metrics.inc("melodai_encodes_total", {"status": "completed"})
+                return result
+            finally:
+                latency = time.perf_counter() - started_at
+                with self._lock:
+                    self._running -= 1
+                    self._latencies.append(latency)
+                    self._publish_depth()
+                metrics.observe("melodai_encode_duration_seconds", latency)
+                self._slots.release()
+
+        return self._executor.submit(job)
+
+    def _publish_depth(self):
+        """
+        Update the queue depth and in-flight gauges. Caller holds the lock.
+        """
+        metrics.set("melodai_encoding_queue_depth", self._pending)
+        metrics.set("melodai_encoding_in_flight", self._running)
+
+    def stats(self):
+        """
+        Return queue depth and encode latency metrics.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            queue_waits = np.array(self._queue_waits) * 1000
+            return {
+                "queue_depth": self._pending,
+                "in_flight": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "encode_latency_avg_ms": round(float(latencies.mean()), 1) if latencies.size else 0.0,
+                "encode_latency_p95_ms": round(float(np.percentile(latencies, 95)), 1) if latencies.size else 0.0,
+                "queue_wait_avg_ms": round(float(queue_waits.mean()), 1) if queue_waits.size else 0.0,
+            }
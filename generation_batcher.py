@@ -0,0 +1,119 @@
+# generation_batcher.py
+#
+# This module defines the DynamicBatcher class, which collects generation requests coming from
+# different Streamlit sessions and merges them into a single batched MusicGen call. Requests that
+# ask for streaming are streamed when they end up alone in a batch, and batched like any other
+# request when other sessions are waiting, so streaming playback never bypasses the batcher.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import Config
+from memory_tracker import current_request_id, request_context
+
+
+class DynamicBatcher:
+    """
+    Gathers requests that arrive within a short window into one `generate_batch` call.
+    The first request of a batch waits at most `max_wait` seconds for others to join,
+    and a batch is dispatched immediately once it reaches `max_batch_size`.
+    """
+    def __init__(self, generator, max_batch_size=None, max_wait=None):
+        """
+        Initialize the batcher around a shared MusicGenerator and start the worker thread.
+        """
+        self.generator = generator
+        self.max_batch_size = max_batch_size or Config.BATCH_MAX_SIZE
+        self.max_wait = Config.BATCH_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        self._queue = queue.Queue()
+        # Requests waiting here count towards the load the token budget controller sees
+        if getattr(generator, "token_budget", None) is not None:
+            generator.token_budget.add_queue_source(self._queue.qsize)
+        self._worker = threading.Thread(target=self._run, name="melodai-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, params, progress_callback=None, on_chunk=None):
+        """
+        Queue a parameter set for generation.
+        `progress_callback` receives the decoded fraction of the batch the request ends up in,
+        called from the batcher thread.
+        `on_chunk` asks for streaming: if the request is alone in its batch, it receives the
+        decoded float32 chunks from the batcher thread as they are generated. In a batch with
+        other requests the track is generated without streaming and only progress is reported.
+        Returns a Future that resolves to the path of the generated track.
+        """
+        future = Future()
+        self._queue.put((params, future, progress_callback, on_chunk, current_request_id()))
+        return future
+
+    def generate_music(self, params):
+        """
+        Blocking helper with the same signature as `MusicGenerator.generate_music`.
+        """
+        return self.submit(params).result()
+
+    def _collect_batch(self):
+        """
+        Block until one request arrives, then keep collecting until the batch is full
+        or the wait window of the first request has elapsed.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """
+        Worker loop: run one padded generate call per batch and hand each caller its own audio.
+        A batch of one streaming request is streamed instead.
+        """
+        while True:
+            batch = self._collect_batch()
+            # Skip requests whose callers have already given up
+            batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Memory of the batched call is attributed to all of its requests
+            request_ids = ",".join(str(request_id) for *_, request_id in batch if request_id)
+            try:
+                with request_context(request_ids or None):
+                    params, _, _, on_chunk, _ = batch[0]
+                    if len(batch) == 1 and on_chunk is not None:
+                        encode_futures = [self.generator.generate_music_streaming_async(params, on_chunk)]
+                    else:
+                        encode_futures = self.generator.generate_batch_async(
+                            [params for params, *_ in batch],
+                            progress_callbacks=[callback for _, _, callback, _, _ in batch]
+                        )
+            except Exception as e:
+                print(f"🔥 Batched generation failed: {e}")
+                for _, future, *_ in batch:
+                    future.set_exception(e)
+                continue
+
+            # Encoding finishes on the encoding pool while this thread moves on to the next batch
+            for (_, future, *_), encode_future in zip(batch, encode_futures):
+                encode_future.add_done_callback(lambda done, future=future: self._resolve(future, done))
+
+    @staticmethod
+    def _resolve(future, encode_future):
+        """
+        Forward the result or error of an encode job to the caller's Future.
+        """
+        error = encode_future.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(encode_future.result())
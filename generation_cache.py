@@ -0,0 +1,162 @@
+# generation_cache.py
+#
+# This module defines the GenerationCache class, a content-addressed two-tier cache (in-memory LRU
+# plus a size-capped on-disk store) for encoded tracks produced by MusicGenerator. Each track can
+# carry a small JSON metadata record (e.g. the seed it was sampled with), kept next to it on disk.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from config import Config
+
+
+class GenerationCache:
+    """
+    Stores encoded audio keyed by a hash of everything that determines the generated track.
+    Lookups check the in-memory LRU first, then the disk store; disk hits are promoted to memory.
+    Both tiers evict least recently used entries once their byte budget is exceeded.
+    """
+    def __init__(self, cache_dir=None, memory_limit_mb=None, disk_limit_mb=None):
+        self.cache_dir = Path(cache_dir or Config.GENERATION_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_limit = int((memory_limit_mb or Config.GENERATION_CACHE_MEMORY_MB) * 1024 * 1024)
+        self.disk_limit = int((disk_limit_mb or Config.GENERATION_CACHE_DISK_MB) * 1024 * 1024)
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(prompt, model_name, duration, sampling=None, seed=None, extra=None):
+        """
+        Build the content address for a generation request.
+        Every input that changes the produced audio must be part of the key.
+        """
+        payload = {
+            "prompt": prompt,
+            "model": model_name,
+            "duration": duration,
+            "sampling": sampling or {},
+            "seed": seed,
+            "extra": extra or {},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _disk_path(self, key):
+        return self.cache_dir / f"{key}.bin"
+
+    def _metadata_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """
+        Return the cached encoded audio for `key`, or None on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._memory[key]
+
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        # Refresh the access time so disk eviction stays LRU
+        os.utime(path)
+        with self._lock:
+            self.counters["disk_hits"] += 1
+            self._remember(key, data)
+        return data
+
+    def get_metadata(self, key):
+        """
+        Return the metadata stored with `key`, or an empty dict if there is none.
+        """
+        try:
+            return json.loads(self._metadata_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def put(self, key, data, metadata=None):
+        """
+        Store encoded audio in both tiers, and `metadata` (a JSON-serializable dict) on disk.
+        """
+        if metadata is not None:
+            # Written before the audio, so a stored track always has its metadata
+            metadata_path = self._metadata_path(key)
+            tmp_metadata_path = metadata_path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_metadata_path.write_text(json.dumps(metadata), encoding="utf-8")
+            os.replace(tmp_metadata_path, metadata_path)
+
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, data)
+        self._evict_disk()
+
+    def _remember(self, key, data):
+        """
+        Insert into the in-memory LRU and evict until it fits its budget. Caller holds the lock.
+        """
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(data) > self.memory_limit:
+            return
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """
+        Delete the least recently used files until the disk store fits its size cap.
+        """
+        entries = []
+        for path in self.cache_dir.glob("*.bin"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.disk_limit:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self._metadata_path(path.stem).unlink(missing_ok=True)
+            total -= size
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current size of the in-memory tier.
+        """
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                **self.counters,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
@@ -0,0 +1,46 @@
+# generation_control.py
+#
+# Progress reporting and cooperative cancellation for a running `model.generate` call. Both hook into
+# generation as a stopping criterion, which transformers evaluates after every decoding step.
+#
+# torch and transformers are not imported at module level: job_server imports GenerationCancelled
+# while model_loader may still be importing transformers on its background thread, and a second
+# concurrent import of transformers fails with partially initialized names.
+
+
+class GenerationCancelled(Exception):
+    """
+    Raised when a generation request was cancelled before it finished.
+    """
+
+
+class GenerationControl:
+    """
+    Reports the fraction of tokens generated so far and stops generation once `cancel_event` is set.
+    Passed in `stopping_criteria`, which accepts any callable with the StoppingCriteria signature.
+    """
+    def __init__(self, num_tokens, progress_callback=None, cancel_event=None, report_every=10):
+        """
+        Args:
+            num_tokens (int): Number of new tokens the generate call will produce.
+            progress_callback (callable): Receives a float in [0, 1] every `report_every` steps.
+            cancel_event (threading.Event): Generation stops at the next step once this is set.
+        """
+        self.num_tokens = max(1, num_tokens)
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.report_every = report_every
+        self.start_length = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self.start_length is None:
+            self.start_length = input_ids.shape[-1] - 1
+        step = input_ids.shape[-1] - self.start_length
+
+        if self.progress_callback is not None and step % self.report_every == 0:
+            self.progress_callback(min(1.0, step / self.num_tokens))
+
+        cancelled = self.cancel_event is not None and self.cancel_event.is_set()
+        return torch.full((input_ids.shape[0],), cancelled, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,65 @@
+# job_client.py
+#
+# Small HTTP client the Streamlit pages use to talk to job_server.py. Only uses the standard
+# library, so importing it from a page stays cheap.
+
+import json
+import urllib.error
+import urllib.request
+
+from config import Config
+
+
+class JobClient:
+    """
+    Submits generation jobs to the job server and polls them by id.
+    """
+    def __init__(self, base_url=None, timeout=10):
+        self.base_url = (base_url or Config.JOB_SERVER_URL).rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}", data=data, method=method,
+            headers={"Content-Type": "application/json"} if data else {}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = response.read()
+                if response.headers.get("Content-Type") == "application/json":
+                    return json.loads(payload)
+                return payload
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Job server error ({e.code}): {message}") from e
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"Could not reach the job server at {self.base_url}: {e.reason}") from e
+
+    def submit(self, mood_input, priority=0, track_seconds=None, user_id=None, params=None, quality_tier=None):
+        """
+        Queue a job and return it (a dict with at least `id` and `status`).
+        Passing a stored blueprint as `params` skips mood analysis and reuses its seed and quality tier.
+        """
+        return self._request("POST", "/jobs", {
+            "mood_input": mood_input, "priority": priority,
+            "track_seconds": track_seconds, "user_id": user_id, "params": params, "quality_tier": quality_tier,
+        })
+
+    def get(self, job_id):
+        """Current status, stage, progress and result of a job."""
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns the updated job."""
+        return self._request("POST", f"/jobs/{job_id}/cancel")
+
+    def fetch_audio(self, job_id):
+        """MP3 bytes of a completed job, for deployments that do not share the output folder."""
+        return self._request("GET", f"/jobs/{job_id}/audio")
+
+    def health(self):
+        return self._request("GET", "/health")
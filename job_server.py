@@ -0,0 +1,515 @@
+# job_server.py
+#
+# Standalone generation service. Runs as its own process next to the Streamlit app, keeps a persistent
+# SQLite-backed job queue and works through it with the mood analyzer, parameter processor and music
+# generator. Pages submit jobs over a small JSON HTTP API and poll them by id, so a browser refresh or
+# page switch no longer abandons a half-finished track, and the generation tier can be scaled on its own.
+#
+# Usage: python job_server.py [--host 127.0.0.1] [--port 8765] [--workers 1]
+# Then set MELODAI_JOB_SERVER_URL=http://127.0.0.1:8765 for the Streamlit app.
+#
+# API:
+#   POST /jobs                {"mood_input": ..., "priority": 0, "track_seconds": 15, "user_id": 1,
+#                              "quality_tier": "standard"} -> job
+#                             (an optional "params" blueprint skips mood analysis, e.g. to recreate a track;
+#                              "track_seconds" below the tier's length renders a shorter clip, above it a long-form track)
+#   GET  /jobs/<id>           -> job (status, stage, progress, params, audio_path, error)
+#   POST /jobs/<id>/cancel    -> job
+#   GET  /jobs/<id>/audio     -> MP3 bytes of a completed job
+#   GET  /health              -> {"status": "ok", "queued": n, "running": n}
+#   GET  /metrics             -> per-stage timings and counters in the Prometheus text format
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import Config
+from memory_tracker import request_context
+from metrics import metrics
+from quality_tiers import get_tier
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+JOB_COLUMNS = (
+    "id", "status", "priority", "mood_input", "track_seconds", "user_id", "stage", "progress",
+    "params", "audio_path", "error", "cancel_requested", "created_at", "started_at", "finished_at", "quality_tier"
+)
+
+
+def _to_json(value):
+    """
+    json.dumps fallback for the numpy scalars and arrays found in the generated parameters.
+    """
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JobStore:
+    """
+    Persistent job queue in SQLite. Jobs are claimed highest priority first, oldest first within a
+    priority, so the queue survives server restarts and can be shared by several server processes.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.JOB_DB_PATH
+        self.init_database()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Create the jobs table and requeue jobs that were running when the server last stopped."""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    mood_input TEXT NOT NULL,
+                    track_seconds REAL,
+                    user_id INTEGER,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    params TEXT,
+                    audio_path TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    quality_tier TEXT
+                )
+            ''')
+            # Add the quality tier column to queues created before it existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "quality_tier" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN quality_tier TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at)")
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE status IN (?, ?) AND cancel_requested = 1",
+                (CANCELLED, time.time(), QUEUED, RUNNING)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'Waiting in queue', progress = 0, started_at = NULL "
+                "WHERE status = ?", (QUEUED, RUNNING)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def submit(self, mood_input, priority=0, track_seconds=None, user_id=None, params=None, quality_tier=None):
+        """
+        Add a job to the queue and return it. Jobs submitted with `params` skip mood analysis and keep
+        the blueprint's quality tier; others are composed at `quality_tier` (default tier if None).
+        """
+        job_id = uuid.uuid4().hex
+        params_json = json.dumps(params, default=_to_json) if params else None
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT INTO jobs (id, status, priority, mood_input, track_seconds, user_id, params, quality_tier,
+                                  stage, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Waiting in queue', ?)
+            ''', (job_id, QUEUED, priority, mood_input, track_seconds, user_id, params_json, quality_tier, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if the id is unknown."""
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job["params"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        if job["status"] == QUEUED:
+            job["queue_position"] = self.queue_position(job)
+        return job
+
+    def queue_position(self, job):
+        """Number of queued jobs that will be claimed before `job`."""
+        conn = self._connect()
+        try:
+            (ahead,) = conn.execute('''
+                SELECT COUNT(*) FROM jobs WHERE status = ?
+                AND (priority > ? OR (priority = ? AND created_at < ?))
+            ''', (QUEUED, job["priority"], job["priority"], job["created_at"])).fetchone()
+        finally:
+            conn.close()
+        return ahead
+
+    def claim_next(self):
+        """Atomically mark the next queued job as running and return it, or None if the queue is empty."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'Starting', started_at = ? WHERE id = ?",
+                (RUNNING, time.time(), row["id"])
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def update(self, job_id, **fields):
+        """Update columns of a job, e.g. stage and progress."""
+        if "params" in fields:
+            fields["params"] = json.dumps(fields["params"], default=_to_json)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        try:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def finish(self, job_id, status, **fields):
+        """Move a job to one of the finished states."""
+        self.update(job_id, status=status, finished_at=time.time(), **fields)
+
+    def request_cancel(self, job_id):
+        """
+        Cancel a job. Queued jobs are cancelled right away; running jobs are flagged and stopped by
+        their worker. Returns the job, or None if the id is unknown.
+        """
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'Cancelled', finished_at = ?, cancel_requested = 1 "
+                "WHERE id = ? AND status = ?", (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return bool(row and row["cancel_requested"])
+
+    def counts(self):
+        """Number of jobs per status."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {row["status"]: row["n"] for row in rows}
+
+
+_budget_lock = threading.Lock()
+_budget_generators = set()
+
+
+def _register_queue_depth(generator, store):
+    """
+    Let the generator's token budget controller count the jobs still waiting in the queue.
+    Registered once per generator, however many workers share it.
+    """
+    if getattr(generator, "token_budget", None) is None:
+        return
+    with _budget_lock:
+        if id(generator) in _budget_generators:
+            return
+        _budget_generators.add(id(generator))
+    generator.token_budget.add_queue_source(lambda: store.counts().get(QUEUED, 0))
+
+
+class JobWorker(threading.Thread):
+    """
+    Claims jobs from the store and runs them through analysis, blueprint and generation,
+    writing stage and progress back to the store as it goes.
+    """
+    def __init__(self, store, cancel_events, wake, poll_seconds=None):
+        super().__init__(name="melodai-job-worker", daemon=True)
+        self.store = store
+        self.cancel_events = cancel_events
+        self.wake = wake
+        self.poll_seconds = poll_seconds or Config.JOB_POLL_SECONDS
+
+    def run(self):
+        while True:
+            job = self.store.claim_next()
+            if job is None:
+                self.wake.wait(self.poll_seconds)
+                self.wake.clear()
+                continue
+
+            cancel_event = self.cancel_events.setdefault(job["id"], threading.Event())
+            # Cancellation may have been requested through another server process sharing the database
+            if job["cancel_requested"]:
+                cancel_event.set()
+            try:
+                with request_context(job["id"]):
+                    self.run_job(job, cancel_event)
+            finally:
+                self.cancel_events.pop(job["id"], None)
+
+    def run_job(self, job, cancel_event):
+        import model_loader
+
+        job_id = job["id"]
+        print(f"🎵 Job {job_id} started (priority {job['priority']})")
+        try:
+            analyzer, processor, batcher = model_loader.get_models()
+        except Exception as e:
+            self.store.finish(job_id, FAILED, stage="Failed", error=str(e))
+            metrics.inc("melodai_compositions_total", {"status": FAILED})
+            print(f"🔥 Job {job_id} failed: models could not be loaded: {e}")
+            return
+        # Only once the loader thread has finished importing the model stacks
+        from generation_control import GenerationCancelled
+
+        try:
+            generator = batcher.generator
+            _register_queue_depth(generator, self.store)
+
+            def check_cancelled():
+                if cancel_event.is_set() or self.store.is_cancel_requested(job_id):
+                    cancel_event.set()
+                    raise GenerationCancelled("Generation was cancelled")
+
+            if job["params"]:
+                # Recreating a stored blueprint: its seed reproduces the track without re-analysis
+                enhanced_params = dict(job["params"], seed_pinned=True)
+                self.store.update(job_id, stage="Composing your track", progress=0.1)
+            else:
+                self.store.update(job_id, stage="Analyzing emotional tone", progress=0.02)
+                base_params = analyzer.analyze_mood(job["mood_input"])
+                check_cancelled()
+
+                self.store.update(job_id, stage="Building the musical blueprint", progress=0.08)
+                enhanced_params = processor.generate_advanced_parameters(base_params)
+                if job["quality_tier"]:
+                    enhanced_params["quality_tier"] = job["quality_tier"]
+                self.store.update(job_id, params=enhanced_params, stage="Composing your track", progress=0.1)
+            check_cancelled()
+
+            def report(fraction):
+                self.store.update(job_id, progress=0.1 + 0.85 * fraction)
+                if self.store.is_cancel_requested(job_id):
+                    cancel_event.set()
+
+            tier_seconds = get_tier(enhanced_params.get("quality_tier"))["duration_seconds"]
+            if job["params"]:
+                # A recreated blueprint keeps its stored length, not the one selected when it was submitted
+                track_seconds = job["params"].get("track_seconds") or tier_seconds
+            else:
+                track_seconds = job["track_seconds"] or tier_seconds
+            # Fresh blueprints (and recreated library tracks) can be answered from the pre-rendered library
+            library_path = None
+            if track_seconds == tier_seconds and (not job["params"] or job["params"].get("library_id")):
+                library_path = generator.serve_from_library(enhanced_params)
+
+            if library_path:
+                audio_path = library_path
+            elif track_seconds > tier_seconds:
+                seconds_done = 0.0
+
+                def on_chunk(chunk):
+                    nonlocal seconds_done
+                    seconds_done += len(chunk) / Config.SAMPLING_RATE
+                    report(min(1.0, seconds_done / track_seconds))
+
+                audio_path = generator.generate_long_form(
+                    enhanced_params, track_seconds, on_chunk=on_chunk, cancel_event=cancel_event
+                )
+            else:
+                if track_seconds < tier_seconds:
+                    # A shorter track is one generate call of that length, skipping the token budget
+                    enhanced_params["duration_seconds"] = track_seconds
+                audio_path = generator.generate_music(
+                    enhanced_params, progress_callback=report, cancel_event=cancel_event
+                )
+
+            if job["user_id"] is not None:
+                from auth import UserAuth
+                UserAuth().save_music_history(
+                    job["user_id"], job["mood_input"], enhanced_params, os.path.basename(audio_path)
+                )
+
+            self.store.finish(
+                job_id, COMPLETED, stage="Composition complete", progress=1.0,
+                audio_path=audio_path, params=enhanced_params
+            )
+            metrics.inc("melodai_compositions_total", {"status": COMPLETED})
+            print(f"✅ Job {job_id} completed: {audio_path}")
+        except GenerationCancelled:
+            self.store.finish(job_id, CANCELLED, stage="Cancelled")
+            metrics.inc("melodai_compositions_total", {"status": CANCELLED})
+            print(f"⚠️ Job {job_id} cancelled")
+        except Exception as e:
+            self.store.finish(job_id, FAILED, stage="Failed", error=str(e))
+            metrics.inc("melodai_compositions_total", {"status": FAILED})
+            print(f"🔥 Job {job_id} failed: {e}")
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON HTTP API over the job store. `server.store`, `server.cancel_events` and `server.wake`
+    are attached by `create_server`.
+    """
+    JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/cancel|/audio)?$")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, default=_to_json).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            counts = self.server.store.counts()
+            self._send_json(200, {"status": "ok", "queued": counts.get(QUEUED, 0), "running": counts.get(RUNNING, 0)})
+            return
+        if self.path == "/metrics":
+            self._send_metrics()
+            return
+
+        match = self.JOB_PATH.match(self.path)
+        job = self.server.store.get(match.group(1)) if match and match.group(2) != "/cancel" else None
+        if job is None:
+            self._send_json(404, {"error": "Job not found"})
+        elif match.group(2) == "/audio":
+            self._send_audio(job)
+        else:
+            self._send_json(200, job)
+
+    def _send_metrics(self):
+        counts = self.server.store.counts()
+        for status in (QUEUED, RUNNING):
+            metrics.set("melodai_jobs", counts.get(status, 0), {"status": status})
+        data = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_audio(self, job):
+        if job["status"] != COMPLETED or not job["audio_path"] or not os.path.exists(job["audio_path"]):
+            self._send_json(409, {"error": f"No audio available for a {job['status']} job"})
+            return
+        with open(job["audio_path"], "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        store = self.server.store
+        if self.path == "/jobs":
+            try:
+                body = self._read_json()
+                mood_input = str(body.get("mood_input", "")).strip()
+                if not mood_input:
+                    raise ValueError("mood_input is required")
+                track_seconds = body.get("track_seconds")
+                if track_seconds is not None:
+                    track_seconds = min(
+                        max(float(track_seconds), Config.MIN_AUDIO_DURATION_SECONDS), Config.LONGFORM_MAX_SECONDS
+                    )
+                params = body.get("params")
+                if params is not None and not isinstance(params, dict):
+                    raise ValueError("params must be an object")
+                quality_tier = body.get("quality_tier")
+                if quality_tier is not None:
+                    quality_tier = get_tier(quality_tier)["name"]
+                job = store.submit(
+                    mood_input, int(body.get("priority", 0)), track_seconds, body.get("user_id"), params, quality_tier
+                )
+            except (ValueError, TypeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self.server.wake.set()
+            self._send_json(201, job)
+            return
+
+        match = self.JOB_PATH.match(self.path)
+        if not match or match.group(2) != "/cancel":
+            self._send_json(404, {"error": "Not found"})
+            return
+        job = store.request_cancel(match.group(1))
+        if job is None:
+            self._send_json(404, {"error": "Job not found"})
+            return
+        if job["id"] in self.server.cancel_events:
+            self.server.cancel_events[job["id"]].set()
+        self._send_json(200, job)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(host=None, port=None, workers=None, db_path=None):
+    """
+    Build the HTTP server and start its generation workers. Call `serve_forever()` on the result.
+    """
+    store = JobStore(db_path)
+    server = ThreadingHTTPServer((host or Config.JOB_SERVER_HOST, port or Config.JOB_SERVER_PORT), JobRequestHandler)
+    server.store = store
+    server.cancel_events = {}
+    server.wake = threading.Event()
+    for _ in range(workers or Config.JOB_WORKERS):
+        JobWorker(store, server.cancel_events, server.wake).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MelodAI generation job server.")
+    parser.add_argument("--host", default=Config.JOB_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.JOB_SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.JOB_WORKERS, help="Jobs generated concurrently")
+    parser.add_argument("--db", default=Config.JOB_DB_PATH, help="SQLite file holding the job queue")
+    args = parser.parse_args()
+
+    import model_loader
+    model_loader.start_background_loading()
+
+    server = create_server(args.host, args.port, args.workers, args.db)
+    print(f"✅ MelodAI job server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("⚠️ Shutting down job server")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
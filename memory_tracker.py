@@ -0,0 +1,201 @@
+# memory_tracker.py
+#
+# This module defines per-request memory accounting for the compose pipeline. `track_memory` wraps
+# mood analysis and generation, sampling the process RSS in a background thread to find the peak,
+# and optionally snapshots tracemalloc to name the largest Python allocations. Each report carries
+# the request id set with `request_context`, is appended to Config.MEMORY_LOG_FILE and feeds the
+# metrics export, so duration and concurrency limits can be set from measured data.
+#
+# RSS is a process-wide number: when several requests run at once their memory overlaps, so every
+# report also records how many tracked operations were running concurrently.
+
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import ContextDecorator, contextmanager
+
+from config import Config
+from metrics import metrics
+
+MB = 1024 * 1024
+MEMORY_BUCKETS = tuple(size * MB for size in (1, 4, 16, 64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+_request_id = contextvars.ContextVar("melodai_request_id", default=None)
+_lock = threading.Lock()
+_active = 0
+_tracemalloc_users = 0
+recent_reports = deque(maxlen=200)
+
+metrics.describe("melodai_process_rss_bytes", "gauge", "Resident set size of the process after the last tracked operation.")
+metrics.describe("melodai_request_rss_growth_bytes", "histogram", "Peak RSS minus RSS at the start of a tracked operation.")
+metrics.describe("melodai_request_rss_growth_max_bytes", "gauge",
+                 "Largest RSS growth among recent requests, labelled with the request that caused it.")
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes, or None if it cannot be read on this platform.
+    psutil is used when installed; otherwise /proc is read directly (Linux).
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def request_context(request_id):
+    """
+    Attribute the tracked operations inside the block (on this thread) to `request_id`.
+    """
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+def set_request_id(request_id):
+    """
+    Attribute the tracked operations that follow in the current context to `request_id`.
+    """
+    _request_id.set(request_id)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class track_memory(ContextDecorator):
+    """
+    Records RSS before, after and peak for one operation, as a `with` block or decorator.
+    Does nothing unless Config.MEMORY_TRACKING is on.
+    """
+    def __init__(self, operation):
+        self.operation = operation
+
+    def _recreate_cm(self):
+        # A fresh tracker per decorated call, so concurrent calls do not share state
+        return track_memory(self.operation)
+
+    def __enter__(self):
+        global _active, _tracemalloc_users
+        self.enabled = Config.MEMORY_TRACKING and current_rss() is not None
+        if not self.enabled:
+            return self
+
+        with _lock:
+            _active += 1
+            self.concurrent = _active
+            if Config.MEMORY_TRACEMALLOC:
+                _tracemalloc_users += 1
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+        self.snapshot = None
+        if Config.MEMORY_TRACEMALLOC:
+            tracemalloc.reset_peak()
+            self.snapshot = tracemalloc.take_snapshot()
+
+        self.request_id = current_request_id()
+        self.started = time.perf_counter()
+        self.rss_before = self.rss_peak = current_rss()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="melodai-memory-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(Config.MEMORY_SAMPLE_SECONDS):
+            self.rss_peak = max(self.rss_peak, current_rss())
+            with _lock:
+                self.concurrent = max(self.concurrent, _active)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active, _tracemalloc_users
+        if not self.enabled:
+            return False
+
+        self._stop.set()
+        self._sampler.join()
+        rss_after = current_rss()
+        self.rss_peak = max(self.rss_peak, rss_after)
+
+        report = {
+            "time": time.time(),
+            "request_id": self.request_id,
+            "operation": self.operation,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "rss_before_mb": round(self.rss_before / MB, 1),
+            "rss_after_mb": round(rss_after / MB, 1),
+            "rss_peak_mb": round(self.rss_peak / MB, 1),
+            "rss_growth_mb": round((self.rss_peak - self.rss_before) / MB, 1),
+            "concurrent": self.concurrent,
+            "failed": exc_type is not None,
+        }
+        if self.snapshot is not None:
+            report["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+            report["top_allocations"] = self._top_allocations()
+
+        with _lock:
+            _active -= 1
+            if Config.MEMORY_TRACEMALLOC:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+        record(report, self.rss_peak - self.rss_before, rss_after)
+        return False
+
+    def _top_allocations(self):
+        """
+        Source lines that allocated the most Python memory during the operation and still hold it.
+        """
+        differences = tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")
+        top = [difference for difference in differences if difference.size_diff > 0][:Config.MEMORY_TOP_ALLOCATIONS]
+        return [
+            {
+                "location": f"{difference.traceback[0].filename}:{difference.traceback[0].lineno}",
+                "size_kb": round(difference.size_diff / 1024, 1),
+                "count": difference.count_diff,
+            }
+            for difference in top
+        ]
+
+
+def record(report, growth_bytes, rss_after):
+    """
+    Keep the report, log it to Config.MEMORY_LOG_FILE and update the exported metrics.
+    """
+    operation = report["operation"]
+    print(
+        f"🧠 Memory [{report['request_id'] or '-'}] {operation}: RSS {report['rss_before_mb']:.0f} -> "
+        f"{report['rss_after_mb']:.0f} MB, peak {report['rss_peak_mb']:.0f} MB (+{report['rss_growth_mb']:.0f} MB)"
+    )
+    with _lock:
+        recent_reports.append(report)
+        # One series per operation, naming the recent request with the largest growth
+        worst = max(
+            (item for item in recent_reports if item["operation"] == operation), key=lambda item: item["rss_growth_mb"]
+        )
+        if Config.MEMORY_LOG_FILE:
+            try:
+                with open(Config.MEMORY_LOG_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(report) + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not write memory log: {e}")
+
+    metrics.set("melodai_process_rss_bytes", rss_after)
+    metrics.observe("melodai_request_rss_growth_bytes", growth_bytes, {"operation": operation}, buckets=MEMORY_BUCKETS)
+    metrics.replace(
+        "melodai_request_rss_growth_max_bytes", worst["rss_growth_mb"] * MB,
+        {"operation": operation, "request_id": worst["request_id"] or ""}, match={"operation": operation}
+    )
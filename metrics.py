@@ -0,0 +1,169 @@
+# metrics.py
+#
+# This module collects timings and counters for the compose pipeline and renders them in the
+# Prometheus text exposition format. Pipeline stages are timed with `span`, which feeds one
+# histogram per stage and counts the stage's failures. The job server serves the text at /metrics;
+# the Streamlit app writes it to Config.METRICS_FILE after each composition, for a textfile
+# collector or sidecar to pick up.
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+# Histogram buckets in seconds, from tokenization (milliseconds) up to long-form generation (minutes)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters, gauges and histograms, each identified by a metric name plus labels.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def describe(self, name, metric_type, help_text):
+        """Register the TYPE and HELP lines for a metric."""
+        self._descriptions[name] = (metric_type, help_text)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        """Add `value` to a counter."""
+        if not Config.METRICS_ENABLED:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        """Set a gauge."""
+        if not Config.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def replace(self, name, value, labels, match):
+        """
+        Set a gauge after removing the series of `name` whose labels include all of `match`,
+        for gauges that name the current worst offender in a label.
+        """
+        if not Config.METRICS_ENABLED:
+            return
+        with self._lock:
+            for key in [key for key in self._gauges if key[0] == name and set(match.items()) <= set(key[1])]:
+                del self._gauges[key]
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None, buckets=STAGE_BUCKETS):
+        """Record one observation in a histogram."""
+        if not Config.METRICS_ENABLED:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Time a pipeline stage into melodai_stage_duration_seconds{stage=...}, as a `with` block or
+        as a function decorator. A stage that raises is still timed and also counted in
+        melodai_stage_failures_total.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("melodai_stage_failures_total", {"stage": stage})
+            raise
+        finally:
+            self.observe("melodai_stage_duration_seconds", time.perf_counter() - start, {"stage": stage})
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: dict(value, counts=list(value["counts"])) for key, value in self._histograms.items()}
+
+        families = {}
+        for (name, labels), value in sorted(counters.items()):
+            families.setdefault(name, ("counter", []))[1].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in sorted(gauges.items()):
+            families.setdefault(name, ("gauge", []))[1].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+            lines = families.setdefault(name, ("histogram", []))[1]
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                bucket_labels = labels + (("le", _format_value(float(bound))),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        output = []
+        for name in sorted(families):
+            metric_type, lines = families[name]
+            help_text = self._descriptions.get(name, (metric_type, name))[1]
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def write_file(self, path=None):
+        """
+        Write the exposition text to `path` (default Config.METRICS_FILE), replacing it atomically
+        so a scraper never reads a half-written file. Does nothing when no file is configured.
+        """
+        path = path or Config.METRICS_FILE
+        if not path or not Config.METRICS_ENABLED:
+            return
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+
+
+metrics = MetricsRegistry()
+metrics.describe("melodai_stage_duration_seconds", "histogram", "Time spent in each compose pipeline stage.")
+metrics.describe("melodai_stage_failures_total", "counter", "Pipeline stages that raised an error.")
+metrics.describe("melodai_generation_requests_total", "counter", "Tracks requested from the music generator, by kind.")
+metrics.describe("melodai_cache_hits_total", "counter", "Lookups answered by a cache or the track library.")
+metrics.describe("melodai_cache_misses_total", "counter", "Lookups not answered by a cache or the track library.")
+metrics.describe("melodai_compositions_total", "counter", "Finished compositions, by outcome.")
+metrics.describe("melodai_jobs", "gauge", "Jobs in the job server queue, by status.")
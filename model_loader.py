@@ -0,0 +1,73 @@
+# model_loader.py
+#
+# Loads the AI models once per server process in a background thread, so the heavy imports and
+# weight loading overlap with users logging in instead of blocking the first Compose page.
+
+import threading
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_thread = None
+_models = None
+_error = None
+
+
+def _load():
+    """
+    Import the model stacks and build the shared analyzer, parameter processor and batcher.
+    """
+    global _models, _error
+    try:
+        from mood_analyzer import MoodAnalyzer
+        from music_parameters import MusicParameterProcessor
+        from music_generator import MusicGenerator
+        from generation_batcher import DynamicBatcher
+
+        analyzer = MoodAnalyzer()
+        processor = MusicParameterProcessor()
+        # Shared across sessions so concurrent requests are merged into one generate call
+        batcher = DynamicBatcher(MusicGenerator())
+        _models = (analyzer, processor, batcher)
+        print("✅ All AI models are ready.")
+    except Exception as e:
+        print(f"🔥 Background model loading failed: {e}")
+        _error = e
+    finally:
+        _ready.set()
+
+
+def start_background_loading():
+    """
+    Start loading the models in a daemon thread. Safe to call from every page and rerun;
+    only the first call starts the thread.
+    """
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_load, name="melodai-model-loader", daemon=True)
+            _thread.start()
+
+
+def is_ready():
+    """
+    True once loading has finished, successfully or not.
+    """
+    return _ready.is_set()
+
+
+def get_models(timeout=None):
+    """
+    Return (analyzer, processor, batcher), starting the load if needed and waiting for it.
+    Re-raises the loading error if the models could not be loaded; the next call retries.
+    """
+    global _thread, _error
+    start_background_loading()
+    if not _ready.wait(timeout):
+        raise TimeoutError("AI models are still loading")
+
+    with _lock:
+        if _error is not None:
+            error, _error, _thread = _error, None, None
+            _ready.clear()
+            raise error
+    return _models
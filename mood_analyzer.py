@@ -4,11 +4,43 @@
 # This module defines the MoodAnalyzer class, which uses NLP models to analyze a user's mood description
 # and map it to musical parameters (such as mood, energy, tempo, key, instruments, etc.) for AI music composition.
 
-import torch
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+# torch, transformers and sentence_transformers are imported inside the methods that use them,
+# so importing this module does not pull in the model stacks.
+import json
+
+from analysis_cache import AnalysisCache
 from config import Config
+from memory_tracker import track_memory
+from metrics import metrics
+from mood_index import MoodPrototypeIndex, descriptions_hash
+
+# Descriptor phrases (prototypes) per mood; Config.MOOD_PROTOTYPES_FILE can add more
+MOOD_DESCRIPTIONS = {
+    "happy": ["joyful cheerful upbeat positive energetic bright"],
+    "sad": ["melancholy sorrowful depressed gloomy downcast"],
+    "calm": ["peaceful tranquil serene relaxed meditative quiet"],
+    "energetic": ["dynamic powerful intense vigorous exciting"],
+    "mysterious": ["enigmatic dark atmospheric suspenseful eerie"],
+    "romantic": ["loving tender passionate intimate gentle warm"]
+}
+
+
+def load_mood_descriptions():
+    """
+    The built-in mood descriptions plus the phrases in Config.MOOD_PROTOTYPES_FILE, a JSON object
+    of {mood: [phrase, ...]} that can extend existing moods or add new ones.
+    """
+    descriptions = {mood: list(phrases) for mood, phrases in MOOD_DESCRIPTIONS.items()}
+    if Config.MOOD_PROTOTYPES_FILE:
+        try:
+            with open(Config.MOOD_PROTOTYPES_FILE, encoding="utf-8") as f:
+                extra = json.load(f)
+        except FileNotFoundError:
+            extra = {}
+        for mood, phrases in extra.items():
+            descriptions.setdefault(mood, []).extend(phrases)
+    return descriptions
+
 
 class MoodAnalyzer:
     """
@@ -20,13 +52,29 @@ class MoodAnalyzer:
         Initialize the MoodAnalyzer by loading required models and precomputing mood embeddings.
         """
         self.setup_models()
-        self.mood_embeddings = self.create_mood_embeddings()
+        self.mood_descriptions = load_mood_descriptions()
+        self.mood_index = self.create_mood_embeddings()
+        self.analysis_cache = None
+        if Config.ANALYSIS_CACHE_ENABLED:
+            self.analysis_cache = AnalysisCache(self.model_names, descriptions_hash(self.mood_descriptions))
 
     def setup_models(self):
         """
         Initialize Hugging Face models for sentiment analysis and sentence embeddings.
         If custom models fail to load, fallback to default models.
         """
+        # The ONNX backend needs PyTorch only to export, so it is tried before importing it
+        if Config.NLP_BACKEND == "onnx":
+            try:
+                self.setup_onnx_models()
+                return
+            except Exception as e:
+                print(f"⚠️ ONNX Runtime backend unavailable, using PyTorch: {e}")
+
+        import torch
+        from transformers import pipeline
+        from sentence_transformers import SentenceTransformer
+
         try:
             # Sentiment analysis model
             self.sentiment_pipeline = pipeline(
@@ -37,36 +85,50 @@ class MoodAnalyzer:
 
             # Sentence embedding model
             self.embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
+            self.model_names = (Config.SENTIMENT_MODEL, Config.EMBEDDING_MODEL)
+
+            if Config.SHARED_WEIGHTS and not torch.cuda.is_available():
+                from shared_weights import share_weights
+                share_weights(self.sentiment_pipeline.model, Config.SENTIMENT_MODEL)
+                share_weights(self.embedding_model, Config.EMBEDDING_MODEL)
 
-            print("\u2705 Models loaded successfully!")
+            print("✅ Models loaded successfully!")
 
         except Exception as e:
-            print(f"\u26a0\ufe0f Error loading models: {e}")
+            print(f"⚠️ Error loading models: {e}")
             # Fallback to simpler models
             self.sentiment_pipeline = pipeline("sentiment-analysis")
             self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.model_names = (self.sentiment_pipeline.model.name_or_path, 'all-MiniLM-L6-v2')
 
-    def create_mood_embeddings(self):
+    def setup_onnx_models(self):
         """
-        Pre-compute sentence embeddings for each mood category using descriptive keywords.
-        Returns a dictionary mapping mood names to their embedding vectors.
+        Load both models through the ONNX Runtime backend, exporting them on first use.
+        Quantized models produce slightly different outputs, so they get their own cache keys.
         """
-        mood_descriptions = {
-            "happy": ["joyful cheerful upbeat positive energetic bright"],
-            "sad": ["melancholy sorrowful depressed gloomy downcast"],
-            "calm": ["peaceful tranquil serene relaxed meditative quiet"],
-            "energetic": ["dynamic powerful intense vigorous exciting"],
-            "mysterious": ["enigmatic dark atmospheric suspenseful eerie"],
-            "romantic": ["loving tender passionate intimate gentle warm"]
-        }
+        from onnx_backend import OnnxSentenceEncoder, OnnxSentimentPipeline
 
-        embeddings = {}
-        for mood, descriptions in mood_descriptions.items():
-            embedding = self.embedding_model.encode(descriptions[0])
-            embeddings[mood] = embedding
+        quantize = Config.ONNX_QUANTIZE_INT8
+        self.sentiment_pipeline = OnnxSentimentPipeline.load(Config.SENTIMENT_MODEL, quantize)
+        self.embedding_model = OnnxSentenceEncoder.load(Config.EMBEDDING_MODEL, quantize)
+        suffix = "@onnx-int8" if quantize else "@onnx"
+        self.model_names = (Config.SENTIMENT_MODEL + suffix, Config.EMBEDDING_MODEL + suffix)
+        print(f"✅ ONNX Runtime models loaded successfully ({'int8' if quantize else 'fp32'})!")
 
-        return embeddings
+    def create_mood_embeddings(self):
+        """
+        Pre-compute sentence embeddings for every descriptor phrase of every mood category.
+        Returns a MoodPrototypeIndex over the normalized embeddings. The embeddings are saved under
+        Config.MOOD_PROTOTYPE_CACHE_DIR and memory-mapped by later starts with the same embedding
+        model and descriptors.
+        """
+        if not Config.MOOD_PROTOTYPE_CACHE_DIR:
+            return MoodPrototypeIndex.build(self.embedding_model, self.mood_descriptions)
+        return MoodPrototypeIndex.load_or_build(
+            self.embedding_model, self.mood_descriptions, self.model_names[1], Config.MOOD_PROTOTYPE_CACHE_DIR
+        )
 
+    @track_memory("analyze_mood")
     def analyze_mood(self, user_input):
         """
         Analyze the user's mood description and return a dictionary of musical parameters.
@@ -75,46 +137,116 @@ class MoodAnalyzer:
             2. Mood classification (embedding similarity)
             3. Energy level extraction
             4. Generate musical parameters
+        Results are kept in the analysis cache, so a repeated description skips the models.
         Returns a dict of parameters or default values on error.
         """
         try:
+            cached = self._cached_parameters(user_input)
+            if cached is not None:
+                return cached
+
             # Get sentiment analysis result
-            sentiment_result = self.sentiment_pipeline(user_input)[0]
+            with metrics.span("sentiment_analysis"):
+                sentiment_result = self.sentiment_pipeline(user_input)[0]
 
             # Get mood category using embeddings
-            mood_category = self.classify_mood(user_input)
-
-            # Extract energy level from sentiment and text
-            energy_level = self.extract_energy_level(user_input, sentiment_result)
-
-            # Generate musical parameters
-            parameters = self.generate_musical_parameters(
-                mood_category, energy_level, sentiment_result
-            )
+            with metrics.span("mood_classification"):
+                input_embedding = self.embedding_model.encode([user_input])
+                mood_category = self.mood_index.best(input_embedding)[0]
 
+            parameters = self._parameters_from_analysis(user_input, sentiment_result, mood_category)
+            self._store_analysis(user_input, sentiment_result, input_embedding, parameters)
             return parameters
 
         except Exception as e:
             print(f"Error in mood analysis: {e}")
             return self.get_default_parameters()
 
+    @track_memory("analyze_many")
+    def analyze_many(self, texts, batch_size=None):
+        """
+        Batched counterpart of `analyze_mood`: runs the sentiment pipeline and the sentence encoder
+        over batches of `batch_size` texts (default Config.ANALYSIS_BATCH_SIZE) instead of one
+        text at a time. Texts are sorted by length before batching, so each batch pads to similar
+        lengths. Texts found in the analysis cache are left out of the batches.
+        Returns one parameter dict per text, in input order.
+        A batch that fails is analyzed text by text, so one bad input only gets the defaults.
+        """
+        batch_size = batch_size or Config.ANALYSIS_BATCH_SIZE
+        texts = list(texts)
+        results = [self._cached_parameters(text) for text in texts]
+        missing = [index for index, result in enumerate(results) if result is None]
+        order = sorted(missing, key=lambda index: len(texts[index]))
+
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            batch = [texts[index] for index in indices]
+            try:
+                with metrics.span("sentiment_analysis"):
+                    sentiment_results = self.sentiment_pipeline(batch, batch_size=len(batch))
+                with metrics.span("mood_classification"):
+                    embeddings = self.embedding_model.encode(batch, batch_size=len(batch))
+                    mood_categories = self.mood_index.best(embeddings)
+
+                for index, text, sentiment_result, embedding, mood_category in zip(
+                    indices, batch, sentiment_results, embeddings, mood_categories
+                ):
+                    results[index] = self._parameters_from_analysis(text, sentiment_result, mood_category)
+                    self._store_analysis(text, sentiment_result, embedding, results[index])
+
+            except Exception as e:
+                print(f"Error in batched mood analysis, analyzing {len(batch)} texts one by one: {e}")
+                for index, text in zip(indices, batch):
+                    results[index] = self.analyze_mood(text)
+
+        return results
+
+    def _cached_parameters(self, user_input):
+        """
+        The cached parameters for `user_input`, or None on a miss or without a cache.
+        """
+        if self.analysis_cache is None:
+            return None
+        entry = self.analysis_cache.get(user_input)
+        if entry is None:
+            metrics.inc("melodai_cache_misses_total", {"cache": "analysis"})
+            return None
+        metrics.inc("melodai_cache_hits_total", {"cache": "analysis"})
+        return entry["parameters"]
+
+    def _store_analysis(self, user_input, sentiment_result, embedding, parameters):
+        if self.analysis_cache is not None:
+            self.analysis_cache.put(user_input, sentiment_result, embedding, parameters)
+
+    def _parameters_from_analysis(self, user_input, sentiment_result, mood_category):
+        """
+        Turn the model outputs for one text into musical parameters.
+        """
+        # Extract energy level from sentiment and text
+        energy_level = self.extract_energy_level(user_input, sentiment_result)
+
+        # Generate musical parameters
+        return self.generate_musical_parameters(mood_category, energy_level, sentiment_result)
+
+    @metrics.span("mood_classification")
     def classify_mood(self, user_input):
         """
         Classify the mood of the input text by comparing its embedding to precomputed mood embeddings.
         Returns the mood category with the highest cosine similarity.
         """
         input_embedding = self.embedding_model.encode([user_input])
+        return self.mood_index.best(input_embedding)[0]
 
-        similarities = {}
-        for mood, mood_embedding in self.mood_embeddings.items():
-            similarity = cosine_similarity(
-                input_embedding.reshape(1, -1),
-                mood_embedding.reshape(1, -1)
-            )[0][0]
-            similarities[mood] = similarity
-
-        # Return mood with highest similarity
-        return max(similarities, key=similarities.get)
+    def classify_mood_scores(self, user_input, top_k=None):
+        """
+        Like `classify_mood`, with the details: returns {"mood", "top": [(mood, score), ...],
+        "weights": {mood: weight}} with the Config.MOOD_TOP_K best moods and softmax weights
+        over all moods.
+        """
+        input_embedding = self.embedding_model.encode([user_input])
+        return self.mood_index.classify(
+            input_embedding, top_k=top_k or Config.MOOD_TOP_K, temperature=Config.MOOD_SOFTMAX_TEMPERATURE
+        )[0]
 
     def extract_energy_level(self, text, sentiment_result):
         """
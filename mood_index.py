@@ -0,0 +1,159 @@
+# mood_index.py
+#
+# This module defines the MoodPrototypeIndex, the lookup behind mood classification. Every mood is
+# described by one or more descriptor phrases (prototypes); their embeddings are L2-normalized and
+# stacked into one float32 matrix grouped by mood. Classifying a text is then a single matrix-vector
+# product (matrix-matrix for a batch) followed by a per-mood max, so the cost stays flat as moods and
+# descriptor phrases are added.
+#
+# The matrix is saved as a versioned .npy file named after the embedding model and a hash of the
+# descriptor text. Later processes memory-map it instead of re-encoding the descriptors, so startup
+# does not grow with the descriptor set; editing a phrase or switching models writes a new file.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Bump when the saved matrix layout changes, so old files are ignored
+PROTOTYPE_FORMAT_VERSION = 1
+
+
+def descriptions_hash(descriptions):
+    """
+    Short content hash of {mood: [descriptor phrase, ...]}, for keying anything derived from them.
+    """
+    encoded = json.dumps(descriptions, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class MoodPrototypeIndex:
+    """
+    Pre-normalized prototype embeddings of every mood. A mood's score for a text is the cosine
+    similarity of its closest prototype.
+    """
+    def __init__(self, moods, embeddings, prepared=False):
+        """
+        Args:
+            moods: The mood of each prototype row, e.g. ["happy", "happy", "sad", ...].
+            embeddings: Prototype embeddings, one row per entry of `moods`.
+            prepared: The embeddings are already normalized float32 rows grouped by mood (e.g. a
+                memory-mapped saved matrix) and are used as they are, without a copy.
+        """
+        if len(moods) != len(embeddings) or not len(moods):
+            raise ValueError("Need one embedding per prototype mood, and at least one prototype")
+        # Rows grouped by mood (stable, in order of first appearance) so per-mood maxima are one reduceat
+        self.moods = list(dict.fromkeys(moods))
+        rank = {mood: column for column, mood in enumerate(self.moods)}
+        if prepared:
+            self.matrix = embeddings
+        else:
+            order = sorted(range(len(moods)), key=lambda row: rank[moods[row]])
+            self.matrix = np.ascontiguousarray(_normalize(np.asarray(embeddings)[order]))
+        counts = np.bincount([rank[mood] for mood in moods], minlength=len(self.moods))
+        self._starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.intp)
+
+    @classmethod
+    def build(cls, embedding_model, descriptions):
+        """
+        Encodes `descriptions` ({mood: [descriptor phrase, ...]}) with `embedding_model` in one
+        batched call and returns the index.
+        """
+        moods = [mood for mood, phrases in descriptions.items() for _ in phrases]
+        phrases = [phrase for mood_phrases in descriptions.values() for phrase in mood_phrases]
+        return cls(moods, embedding_model.encode(phrases))
+
+    @staticmethod
+    def cache_path(cache_dir, model_name, descriptions):
+        """
+        File of the saved matrix for this embedding model and descriptor set.
+        """
+        model_hash = hashlib.sha256(str(model_name).encode("utf-8")).hexdigest()[:16]
+        filename = f"prototypes-v{PROTOTYPE_FORMAT_VERSION}-{model_hash}-{descriptions_hash(descriptions)}.npy"
+        return os.path.join(cache_dir, filename)
+
+    @classmethod
+    def load_or_build(cls, embedding_model, descriptions, model_name, cache_dir):
+        """
+        Memory-maps the matrix saved for `model_name` and `descriptions` under `cache_dir`, or
+        builds it with `embedding_model` and saves it there when there is none (or it is unreadable).
+        """
+        moods = [mood for mood, phrases in descriptions.items() for _ in phrases]
+        path = cls.cache_path(cache_dir, model_name, descriptions)
+        try:
+            matrix = np.load(path, mmap_mode="r")
+            if matrix.dtype == np.float32 and matrix.ndim == 2 and matrix.shape[0] == len(moods):
+                return cls(moods, matrix, prepared=True)
+            print(f"⚠️ Ignoring mood prototypes in {path}: unexpected shape {matrix.shape}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read mood prototypes from {path}: {e}")
+
+        index = cls.build(embedding_model, descriptions)
+        try:
+            index.save(path)
+            print(f"✅ Mood prototypes saved to {path}")
+        except OSError as e:
+            print(f"⚠️ Could not save mood prototypes to {path}: {e}")
+        return index
+
+    def save(self, path):
+        """
+        Writes the normalized, mood-grouped matrix to `path` as .npy, replacing it atomically so
+        a process starting up never maps a half-written file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, np.asarray(self.matrix, dtype=np.float32))
+        os.replace(temporary, path)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def scores(self, embeddings):
+        """
+        Returns the (texts, moods) matrix of per-mood scores for one embedding or a batch of them,
+        columns in the order of `self.moods`.
+        """
+        queries = _normalize(np.atleast_2d(embeddings))
+        similarities = queries @ self.matrix.T
+        return np.maximum.reduceat(similarities, self._starts, axis=1)
+
+    def classify(self, embeddings, top_k=3, temperature=0.05):
+        """
+        Classifies one embedding or a batch of them. Returns one dict per embedding:
+            - "mood": the best-scoring mood
+            - "top": the `top_k` best (mood, score) pairs, best first
+            - "weights": softmax weights over all moods at `temperature`, for blending moods
+        """
+        scores = self.scores(embeddings)
+        top_k = min(top_k, len(self.moods))
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+
+        logits = (scores - scores.max(axis=1, keepdims=True)) / temperature
+        weights = np.exp(logits)
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        return [
+            {
+                "mood": self.moods[row_top[0]],
+                "top": [(self.moods[column], float(row_scores[column])) for column in row_top],
+                "weights": {mood: float(weight) for mood, weight in zip(self.moods, row_weights)},
+            }
+            for row_scores, row_top, row_weights in zip(scores, top, weights)
+        ]
+
+    def best(self, embeddings):
+        """
+        The best-scoring mood for each embedding, without the top-k and weight details.
+        """
+        return [self.moods[column] for column in np.argmax(self.scores(embeddings), axis=1)]
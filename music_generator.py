@@ -1,33 +1,48 @@
 # music_generator.py
 
-import torch
-from transformers import AutoProcessor, MusicgenForConditionalGeneration
-import scipy.io.wavfile
+from __future__ import annotations
+
 import numpy as np
-from pydub import AudioSegment
-# We don't need `which` anymore because we are setting the path directly.
-import os
+import contextlib
+import copy
+import functools
+import shutil
+import subprocess
+import uuid
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
 
 from config import Config
+import audio_processing
+from encoding_pool import EncodingPool
+from generation_cache import GenerationCache
+from encoder_cache import EncoderCache
+from memory_tracker import track_memory
+from metrics import metrics
+from quality_tiers import SAMPLING_FIELDS, get_tier
+from token_budget import TokenBudgetController
+from track_library import TrackLibrary
 
-# --- FFMPEG Configuration ---
-# This is the definitive fix. We are manually telling pydub where to find ffmpeg.
-# Make sure the path below matches exactly where you extracted ffmpeg.
-# IMPORTANT: Use double backslashes (\\) in the path.
-ffmpeg_path = "C:\\ffmpeg\\bin\\ffmpeg.exe" 
+# torch, transformers and the streaming helpers are imported where they are first needed,
+# so importing this module stays cheap for pages that never generate audio.
 
-# Check if the specified file exists before setting it
-if not os.path.exists(ffmpeg_path):
-    raise RuntimeError(
-        f"ffmpeg.exe not found at the specified path: {ffmpeg_path}\n"
-        "Please verify the path in music_generator.py is correct.\n"
-        "It should point to the ffmpeg.exe file inside the bin folder you extracted."
-    )
 
-# Set the converter path for pydub
-AudioSegment.converter = ffmpeg_path
-print(f"✅ FFMPEG path set to: {AudioSegment.converter}")
+@functools.lru_cache(maxsize=None)
+def find_ffmpeg() -> str:
+    """
+    Locates the ffmpeg executable on first use: Config.FFMPEG_PATH when set, otherwise PATH.
+    """
+    ffmpeg_path = shutil.which(Config.FFMPEG_PATH or "ffmpeg")
+    if ffmpeg_path is None:
+        raise RuntimeError(
+            f"ffmpeg not found (looked for: {Config.FFMPEG_PATH or 'ffmpeg on PATH'}).\n"
+            "Install ffmpeg and add it to PATH, or set the MELODAI_FFMPEG_PATH environment variable "
+            "to the full path of the ffmpeg executable."
+        )
+    print(f"✅ FFMPEG found at: {ffmpeg_path}")
+    return ffmpeg_path
 
 
 class MusicGenerator:
@@ -40,17 +55,135 @@ class MusicGenerator:
         """
         Initializes the MusicGenerator by loading the MusicGen model and processor.
         """
+        import torch
+        from transformers import AutoProcessor, MusicgenForConditionalGeneration
+
         self.device = "cuda:0" if torch.cuda.is_available() and Config.DEVICE == "cuda" else "cpu"
         print(f"Initializing MusicGenerator on device: {self.device}")
         try:
             self.processor = AutoProcessor.from_pretrained(Config.MUSIC_GEN_MODEL)
             self.model = MusicgenForConditionalGeneration.from_pretrained(Config.MUSIC_GEN_MODEL)
             self.model.to(self.device)
+            self.model.eval()
+            if Config.SHARED_WEIGHTS and self.device == "cpu":
+                from shared_weights import share_weights
+                share_weights(self.model, Config.MUSIC_GEN_MODEL)
             print("✅ MusicGen model loaded successfully.")
         except Exception as e:
             print(f"🔥 Failed to load MusicGen model: {e}")
             raise
 
+        self.inference_mode = self._apply_inference_mode(Config.INFERENCE_MODE)
+        # Checkpoints of the quality tiers, loaded on first use; the default one is already here
+        self._checkpoints = {Config.MUSIC_GEN_MODEL: (self.processor, self.model)}
+        self._checkpoint_lock = threading.Lock()
+        self._generation_configs = {}
+
+        self.cache = GenerationCache() if Config.GENERATION_CACHE_ENABLED else None
+        self.encoder_cache = EncoderCache() if Config.ENCODER_CACHE_ENABLED else None
+        self.encoding_pool = EncodingPool()
+        self.library = TrackLibrary() if Config.LIBRARY_ENABLED and TrackLibrary.exists() else None
+        self.token_budget = TokenBudgetController() if Config.LATENCY_SLO_ENABLED else None
+        # Prompts inside a `generate` call, whichever path (batched, streamed, long-form) started them
+        self._active_requests = 0
+        self._active_lock = threading.Lock()
+        if self.token_budget is not None:
+            self.token_budget.add_queue_source(self.active_requests)
+
+    def active_requests(self) -> int:
+        """
+        Returns the number of prompts currently being generated.
+        """
+        return self._active_requests
+
+    def _apply_inference_mode(self, mode: str, model=None) -> str:
+        """
+        Prepares the model (default: the main one) for the requested CPU inference mode and
+        returns the mode in effect:
+            - "fp32": full precision (default)
+            - "int8": dynamic int8 quantization of the decoder's linear layers
+            - "bf16": bfloat16 autocast, only where the CPU supports it natively
+        """
+        import torch
+
+        if mode not in ("fp32", "int8", "bf16"):
+            raise ValueError(f"Unknown inference mode: {mode}")
+        if mode != "fp32" and self.device != "cpu":
+            print(f"⚠️ Inference mode '{mode}' is CPU-only, using fp32 on {self.device}")
+            return "fp32"
+
+        if mode == "int8":
+            torch.ao.quantization.quantize_dynamic(
+                (model or self.model).decoder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+        elif mode == "bf16" and not torch.ops.mkldnn._is_mkldnn_bf16_supported():
+            print("⚠️ This CPU has no native bfloat16 support, using fp32")
+            return "fp32"
+
+        print(f"✅ Inference mode: {mode}")
+        return mode
+
+    def _tier(self, params: dict = None) -> dict:
+        """
+        Returns the quality tier named by params["quality_tier"], or the default tier.
+        """
+        return get_tier((params or {}).get('quality_tier'))
+
+    def _backend(self, tier: dict):
+        """
+        Returns (processor, model, generation_config) for a quality tier. A tier on another
+        checkpoint loads it on first use; the generation config is a copy of the checkpoint's
+        with the tier's sampling and guidance settings applied.
+        """
+        from transformers import AutoProcessor, MusicgenForConditionalGeneration
+
+        checkpoint = tier['model']
+        with self._checkpoint_lock:
+            if checkpoint not in self._checkpoints:
+                print(f"Loading {checkpoint} for the '{tier['name']}' quality tier...")
+                processor = AutoProcessor.from_pretrained(checkpoint)
+                model = MusicgenForConditionalGeneration.from_pretrained(checkpoint)
+                model.to(self.device)
+                model.eval()
+                if Config.SHARED_WEIGHTS and self.device == "cpu":
+                    from shared_weights import share_weights
+                    share_weights(model, checkpoint)
+                self._apply_inference_mode(self.inference_mode, model)
+                self._checkpoints[checkpoint] = (processor, model)
+                print(f"✅ {checkpoint} loaded successfully.")
+            processor, model = self._checkpoints[checkpoint]
+        return processor, model, self._generation_config(tier)
+
+    def _generation_config(self, tier: dict):
+        """
+        Returns the generation config of a quality tier: a copy of its checkpoint's, with the
+        tier's sampling and guidance settings applied. A checkpoint that is not loaded yet only
+        has its generation_config.json read, so building a cache key never loads a model.
+        """
+        checkpoint = tier['model']
+        with self._checkpoint_lock:
+            generation_config = self._generation_configs.get((tier['name'], checkpoint))
+            if generation_config is None:
+                if checkpoint in self._checkpoints:
+                    base_config = self._checkpoints[checkpoint][1].generation_config
+                else:
+                    from transformers import GenerationConfig
+                    base_config = GenerationConfig.from_pretrained(checkpoint)
+                generation_config = copy.deepcopy(base_config)
+                generation_config.update(**{field: tier[field] for field in SAMPLING_FIELDS if field in tier})
+                self._generation_configs[(tier['name'], checkpoint)] = generation_config
+        return generation_config
+
+    def _autocast(self):
+        """
+        Returns the autocast context for the active inference mode.
+        """
+        import torch
+
+        if self.inference_mode == "bf16":
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
     def _create_prompt(self, params: dict) -> str:
         """
         Creates a descriptive text prompt for the MusicGen model based on musical parameters.
@@ -66,57 +199,636 @@ class MusicGenerator:
         )
         return prompt
 
-    def _process_and_save_audio(self, audio_tensor: torch.Tensor, params: dict) -> str:
+    @metrics.span("postprocessing")
+    def _process_audio(self, audio_tensor: torch.Tensor, params: dict) -> np.ndarray:
         """
-        Processes the raw audio tensor: normalizes, adjusts volume, and saves as an MP3.
+        Post-processes the raw audio tensor (DC removal, loudness normalization by energy level,
+        fades) and converts it to 16-bit PCM.
         """
-        print("Processing and saving audio...")
-        audio_np = audio_tensor.squeeze().cpu().numpy()
+        audio_np = audio_tensor.squeeze().float().cpu().numpy()
+        return audio_processing.postprocess(audio_np, Config.SAMPLING_RATE, params.get('energy_level', 5))
 
-        audio_np /= np.max(np.abs(audio_np))
-        volume_factor = 0.6 + (params.get('energy_level', 5) / 25)
-        audio_np *= volume_factor
-        audio_int16 = (audio_np * 32767).astype(np.int16)
+    @metrics.span("mp3_encoding")
+    def _encode_mp3(self, audio_int16: np.ndarray, bitrate: str = "192k") -> bytes:
+        """
+        Encodes 16-bit mono PCM to MP3 by piping it through ffmpeg, without intermediate files.
+        """
+        command = [
+            find_ffmpeg(), "-hide_banner", "-loglevel", "error",
+            "-f", "s16le", "-ar", str(Config.SAMPLING_RATE), "-ac", "1", "-i", "pipe:0",
+            "-f", "mp3", "-b:a", bitrate, "pipe:1"
+        ]
+        result = subprocess.run(command, input=audio_int16.tobytes(), capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode MP3: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout
 
+    def _save_audio(self, audio_bytes: bytes) -> str:
+        """
+        Writes encoded audio to a unique file in the output folder so concurrent
+        requests never overwrite each other. Returns the file path.
+        """
         output_dir = Path("output")
         output_dir.mkdir(exist_ok=True)
-        
-        temp_wav_path = output_dir / "temp_music.wav"
-        final_mp3_path = output_dir / "generated_music.mp3"
 
-        scipy.io.wavfile.write(temp_wav_path, rate=Config.SAMPLING_RATE, data=audio_int16)
-        print(f"Temporary WAV saved to {temp_wav_path}")
+        audio_path = output_dir / f"track_{uuid.uuid4().hex}.mp3"
+        audio_path.write_bytes(audio_bytes)
+        return str(audio_path)
+
+    def _process_and_save_audio(self, audio_tensor: torch.Tensor, params: dict, cache_key: str = None) -> str:
+        """
+        Processes the raw audio tensor: normalizes, adjusts volume, and saves as an MP3.
+        The encoded track is also added to the generation cache when a key is given.
+        """
+        print("Processing and saving audio...")
+        audio_int16 = self._process_audio(audio_tensor, params)
 
         try:
-            audio_segment = AudioSegment.from_wav(temp_wav_path)
-            audio_segment.export(final_mp3_path, format="mp3", bitrate="192k")
-            print(f"✅ Audio exported successfully to {final_mp3_path}")
-            return str(final_mp3_path)
+            audio_bytes = self._encode_mp3(audio_int16, self._tier(params)['bitrate'])
         except Exception as e:
-            print(f"🔥 Error during WAV to MP3 conversion: {e}")
+            print(f"🔥 Error during MP3 encoding: {e}")
             raise
+
+        if cache_key is not None:
+            self._store_cached(cache_key, audio_bytes, params)
+
+        audio_path = self._save_audio(audio_bytes)
+        print(f"✅ Audio exported successfully to {audio_path}")
+        return audio_path
+
+    def _process_and_save_audio_async(self, audio_tensor: torch.Tensor, params: dict, cache_key: str = None) -> Future:
+        """
+        Hands post-processing and encoding to the encoding pool so the model is free for the
+        next request. Returns a Future that resolves to the MP3 path.
+        """
+        return self.encoding_pool.submit(self._process_and_save_audio, audio_tensor, params, cache_key)
+
+    @staticmethod
+    def _completed(audio_path: str) -> Future:
+        """
+        Wraps an already available result (e.g. a cache hit) in a finished Future.
+        """
+        future = Future()
+        future.set_result(audio_path)
+        return future
+
+    def _sampling_settings(self, tier: dict = None) -> dict:
+        """
+        Returns the generation settings of a quality tier that influence the sampled audio.
+        """
+        generation_config = self._generation_config(tier or self._tier())
+        return {
+            "do_sample": generation_config.do_sample,
+            "top_k": generation_config.top_k,
+            "top_p": generation_config.top_p,
+            "temperature": generation_config.temperature,
+            "guidance_scale": generation_config.guidance_scale,
+        }
+
+    def _duration(self, params: dict) -> float:
+        """
+        Returns the seconds of audio to generate for a request. A "duration_seconds" entry in the
+        parameters overrides the choice; otherwise the token budget controller picks the longest
+        duration up to the quality tier's length that meets the latency target
+        ("latency_target_seconds" overrides the target). Tiers without a latency budget always get
+        their full length. The choice is written back to the parameters so a stored blueprint
+        recreates the same length.
+        """
+        if params.get('duration_seconds'):
+            return params['duration_seconds']
+        tier = self._tier(params)
+        if self.token_budget is None or not tier['latency_budget']:
+            seconds = tier['duration_seconds']
+        else:
+            seconds = self.token_budget.choose(
+                requested_seconds=tier['duration_seconds'], target_seconds=params.get('latency_target_seconds'),
+                profile=tier['name']
+            )
+        params['duration_seconds'] = seconds
+        return seconds
+
+    def _cache_key(self, prompt: str, params: dict, pinned: bool = None) -> str:
+        """
+        Builds the generation cache key for a prompt. The energy level is included because
+        it sets the output volume during post-processing, and the inference mode because
+        quantized or bfloat16 inference changes the audio. The quality tier contributes its
+        checkpoint, sampling settings and bitrate. Requests with a pinned seed (Recreate or an
+        explicit seed) only match tracks sampled with that seed; other requests match any seed,
+        since their seed was drawn at random. `pinned` overrides params["seed_pinned"].
+        """
+        tier = self._tier(params)
+        if pinned is None:
+            pinned = params.get('seed_pinned')
+        return GenerationCache.make_key(
+            prompt,
+            tier['model'],
+            params.get('duration_seconds', tier['duration_seconds']),
+            sampling=self._sampling_settings(tier),
+            seed=params.get('seed') if pinned else None,
+            extra={
+                "energy_level": params.get('energy_level', 5), "inference_mode": self.inference_mode,
+                "bitrate": tier['bitrate'],
+            }
+        )
+
+    def _load_cached(self, cache_key: str, params: dict, prompt: str):
+        """
+        Writes a cached track to the output folder and returns its path, or None on a miss.
+        On a hit the cached track's seed is copied into the parameters, so the stored blueprint
+        recreates the audio actually served. A pinned request that misses also accepts the
+        track stored under the unpinned key when it was sampled with the same seed, which is
+        how Recreate finds a track composed without a pinned seed.
+        """
+        if self.cache is None:
+            return None
+        audio_bytes = self.cache.get(cache_key)
+        if audio_bytes is None and params.get('seed_pinned'):
+            unpinned_key = self._cache_key(prompt, params, pinned=False)
+            if self.cache.get_metadata(unpinned_key).get("seed") == params.get('seed'):
+                audio_bytes = self.cache.get(unpinned_key)
+                cache_key = unpinned_key
+        if audio_bytes is None:
+            metrics.inc("melodai_cache_misses_total", {"cache": "generation"})
+            return None
+        metrics.inc("melodai_cache_hits_total", {"cache": "generation"})
+
+        seed = self.cache.get_metadata(cache_key).get("seed")
+        if seed is not None:
+            params['seed'] = seed
+        audio_path = self._save_audio(audio_bytes)
+        print(f"⚡ Served from generation cache: {audio_path}")
+        return audio_path
+
+    def serve_from_library(self, params: dict):
+        """
+        Serves a pre-rendered track from the library built by build_library.py when one matches
+        the blueprint, copying it to the output folder. Returns its path, or None.
+        The library is rendered at the default quality tier, so other tiers always generate.
+        The parameters are replaced by the stored ones, so the blueprint shown and saved to the
+        history describes the audio actually served.
+        """
+        if self.library is None or self._tier(params)['name'] != Config.DEFAULT_QUALITY_TIER:
+            return None
+        match = self.library.lookup(params)
+        if match is None:
+            metrics.inc("melodai_cache_misses_total", {"cache": "library"})
+            return None
+        metrics.inc("melodai_cache_hits_total", {"cache": "library"})
+
+        library_path, stored_params = match
+        params.update(stored_params)
+        audio_path = self._save_audio(library_path.read_bytes())
+        print(f"⚡ Served from track library: {audio_path}")
+        return audio_path
+
+    def _store_cached(self, cache_key: str, audio_bytes: bytes, params: dict):
+        """
+        Adds a freshly encoded track to the generation cache, with the seed it was sampled with.
+        """
+        if self.cache is not None:
+            self.cache.put(cache_key, audio_bytes, metadata={"seed": params.get('seed')})
+
+    def _generate_audio(self, prompts: list, num_tokens: int = None, audio_prompt: np.ndarray = None,
+                        seeds: list = None, tier: dict = None, **generate_kwargs) -> torch.Tensor:
+        """
+        Runs a single padded MusicGen `generate` call over one or more prompts, with the checkpoint
+        and generation settings of `tier` (default: the default quality tier).
+        When `audio_prompt` is given, generation continues from that audio and the returned
+        audio starts with the (re-decoded) prompt.
+        `seeds` holds one seed per prompt; seeded prompts are sampled from their own generator,
+        so the same prompt and seed give the same audio alone or in any batch. Prompts without
+        a seed in a partly seeded batch get a random one.
+        Returns the raw audio tensor with shape (batch, channels, samples).
+        """
+        import torch
+
+        tier = tier or self._tier()
+        processor, model, generation_config = self._backend(tier)
+        # The tier's settings go in as arguments, so explicit ones (e.g. do_sample) still override them
+        settings = {field: tier[field] for field in SAMPLING_FIELDS if field in tier}
+
+        if seeds and any(seed is not None for seed in seeds) and generation_config.do_sample:
+            from transformers import LogitsProcessorList
+            from seeded_sampling import SeededSampler
+
+            seeds = [seed if seed is not None else int(np.random.default_rng().integers(2**31)) for seed in seeds]
+            sampler = SeededSampler(seeds, model.decoder.num_codebooks, generation_config, self.device)
+            generate_kwargs["logits_processor"] = LogitsProcessorList([sampler])
+            generate_kwargs["do_sample"] = False
+            # The sampler applies the tier's top-k, top-p and temperature itself
+            settings = {"guidance_scale": generation_config.guidance_scale}
+
+        if self.encoder_cache is not None:
+            inputs = self._encode_prompts(prompts, tier['model'], processor, model, generation_config)
+            if audio_prompt is not None:
+                with metrics.span("tokenization"):
+                    inputs.update(processor(
+                        audio=[audio_prompt], sampling_rate=Config.SAMPLING_RATE, return_tensors="pt"
+                    ).to(self.device))
+        else:
+            processor_kwargs = {}
+            if audio_prompt is not None:
+                processor_kwargs = {"audio": [audio_prompt], "sampling_rate": Config.SAMPLING_RATE}
+
+            with metrics.span("tokenization"):
+                inputs = processor(
+                    text=prompts,
+                    padding=True,
+                    return_tensors="pt",
+                    **processor_kwargs
+                ).to(self.device)
+
+        if num_tokens is None:
+            num_tokens = int(tier['duration_seconds'] * 50)
+
+        with self._active_lock:
+            self._active_requests += len(prompts)
+        started_at = time.perf_counter()
+        try:
+            with metrics.span("generate"), torch.inference_mode(), self._autocast():
+                audio_values = model.generate(**inputs, max_new_tokens=num_tokens, **dict(settings, **generate_kwargs))
         finally:
-            if os.path.exists(temp_wav_path):
-                os.remove(temp_wav_path)
-                print(f"Removed temporary file: {temp_wav_path}")
+            with self._active_lock:
+                self._active_requests -= len(prompts)
 
+        if self.token_budget is not None:
+            # Frames actually produced, in case a stopping criterion ended generation early
+            frames = min(num_tokens, audio_values.shape[-1] * 50 // Config.SAMPLING_RATE)
+            self.token_budget.record(frames, time.perf_counter() - started_at, profile=tier['name'])
+        return audio_values
 
-    def generate_music(self, params: dict) -> str:
+    def _encode_prompts(self, prompts: list, checkpoint: str, processor, model, generation_config) -> dict:
+        """
+        Returns `generate` inputs with precomputed text-encoder outputs for the prompts, tokenizing
+        and encoding only those not found in the encoder cache. Per-prompt entries are right-padded
+        to a common length with masked positions, which the decoder's cross-attention ignores.
+        Entries are cached per checkpoint, since each has its own text encoder.
+        """
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
+
+        entries = {prompt: self.encoder_cache.get((checkpoint, prompt)) for prompt in dict.fromkeys(prompts)}
+        missing = [prompt for prompt, entry in entries.items() if entry is None]
+        metrics.inc("melodai_cache_hits_total", {"cache": "encoder"}, len(entries) - len(missing))
+        metrics.inc("melodai_cache_misses_total", {"cache": "encoder"}, len(missing))
+        if missing:
+            with metrics.span("tokenization"):
+                tokens = processor(text=missing, padding=True, return_tensors="pt").to(self.device)
+            with metrics.span("text_encoding"), torch.inference_mode(), self._autocast():
+                hidden = model.text_encoder(
+                    input_ids=tokens["input_ids"], attention_mask=tokens["attention_mask"]
+                ).last_hidden_state
+            for i, prompt in enumerate(missing):
+                length = int(tokens["attention_mask"][i].sum())
+                entries[prompt] = {
+                    "input_ids": tokens["input_ids"][i:i + 1, :length].clone(),
+                    "attention_mask": tokens["attention_mask"][i:i + 1, :length].clone(),
+                    "last_hidden_state": hidden[i:i + 1, :length].clone(),
+                }
+                self.encoder_cache.put((checkpoint, prompt), entries[prompt])
+
+        max_length = max(entries[prompt]["input_ids"].shape[1] for prompt in prompts)
+
+        def padded(name, prompt):
+            tensor = entries[prompt][name]
+            padding = max_length - tensor.shape[1]
+            pad = (0, 0, 0, padding) if tensor.dim() == 3 else (0, padding)
+            return torch.nn.functional.pad(tensor, pad)
+
+        input_ids = torch.cat([padded("input_ids", prompt) for prompt in prompts])
+        attention_mask = torch.cat([padded("attention_mask", prompt) for prompt in prompts])
+        hidden = torch.cat([padded("last_hidden_state", prompt) for prompt in prompts])
+
+        # `generate` only appends the null conditioning for classifier-free guidance when it runs
+        # the encoder itself, so it is added here the same way
+        guidance_scale = generation_config.guidance_scale
+        if guidance_scale is not None and guidance_scale > 1:
+            hidden = torch.cat([hidden, torch.zeros_like(hidden)])
+            attention_mask = torch.cat([attention_mask, torch.zeros_like(attention_mask)])
+
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "encoder_outputs": BaseModelOutput(last_hidden_state=hidden),
+        }
+
+    def _generate_controlled(self, prompts: list, progress_callback=None, cancel_event: threading.Event = None,
+                             num_tokens: int = None, tier: dict = None, **generate_kwargs) -> torch.Tensor:
+        """
+        `_generate_audio` with progress reporting and cancellation hooked in as a stopping criterion.
+        Raises GenerationCancelled if `cancel_event` was set, whether `generate` returned early or
+        failed on the truncated token frames.
+        """
+        from transformers import StoppingCriteriaList
+        from generation_control import GenerationControl, GenerationCancelled
+
+        tier = tier or self._tier()
+        if num_tokens is None:
+            num_tokens = int(tier['duration_seconds'] * 50)
+        control = GenerationControl(num_tokens, progress_callback, cancel_event)
+
+        try:
+            audio_values = self._generate_audio(
+                prompts, num_tokens=num_tokens, tier=tier, stopping_criteria=StoppingCriteriaList([control]),
+                **generate_kwargs
+            )
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled("Generation was cancelled") from e
+            raise
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled("Generation was cancelled")
+        return audio_values
+
+    @track_memory("generate_music")
+    def generate_music(self, params: dict, progress_callback=None, cancel_event: threading.Event = None) -> str:
         """
         The main public method to generate music from a set of parameters.
         """
+        return self.generate_music_async(params, progress_callback, cancel_event).result()
+
+    def generate_music_async(self, params: dict, progress_callback=None,
+                             cancel_event: threading.Event = None) -> Future:
+        """
+        Generates the audio on the calling thread and returns as soon as encoding is queued.
+        The returned Future resolves to the MP3 path once encoding completes.
+        `progress_callback` receives the generated fraction in [0, 1] while decoding runs, and
+        setting `cancel_event` stops `model.generate` at the next step and raises GenerationCancelled.
+        params["quality_tier"] selects the quality tier.
+        """
+        metrics.inc("melodai_generation_requests_total", {"kind": "single"})
+        tier = self._tier(params)
         prompt = self._create_prompt(params)
+        num_tokens = int(self._duration(params) * 50)
+        cache_key = self._cache_key(prompt, params)
+        cached_path = self._load_cached(cache_key, params, prompt)
+        if cached_path:
+            return self._completed(cached_path)
+
         print(f"🎵 Generating with prompt: {prompt}")
 
-        inputs = self.processor(
-            text=[prompt],
-            padding=True,
-            return_tensors="pt"
-        ).to(self.device)
+        if progress_callback is not None or cancel_event is not None:
+            audio_values = self._generate_controlled(
+                [prompt], progress_callback, cancel_event, num_tokens=num_tokens, tier=tier, seeds=[params.get('seed')]
+            )
+        else:
+            audio_values = self._generate_audio([prompt], num_tokens=num_tokens, tier=tier, seeds=[params.get('seed')])
 
-        num_tokens = int(Config.AUDIO_DURATION_SECONDS * 50) 
-        
-        audio_values = self.model.generate(**inputs, max_new_tokens=num_tokens)
-        
-        audio_path = self._process_and_save_audio(audio_values, params)
-        return audio_path
\ No newline at end of file
+        return self._process_and_save_audio_async(audio_values, params, cache_key)
+
+    def stream_music(self, params: dict, chunk_seconds: float = None):
+        """
+        Generates music progressively, yielding decoded float32 audio chunks as token frames
+        accumulate instead of waiting for the whole track.
+        """
+        from transformers import StoppingCriteriaList
+        from audio_streamer import MusicgenStreamer
+
+        chunk_seconds = chunk_seconds or Config.STREAM_CHUNK_SECONDS
+        tier = self._tier(params)
+        _, model, _ = self._backend(tier)
+        prompt = self._create_prompt(params)
+        num_tokens = int(self._duration(params) * 50)
+        print(f"🎵 Streaming with prompt: {prompt}")
+
+        # MusicGen produces 50 token frames per second of audio
+        streamer = MusicgenStreamer(model, play_steps=int(chunk_seconds * 50))
+        errors = []
+
+        def run_generation():
+            try:
+                self._generate_audio(
+                    [prompt], num_tokens=num_tokens, seeds=[params.get('seed')], tier=tier,
+                    stopping_criteria=StoppingCriteriaList([streamer])
+                )
+                streamer.end()
+            except Exception as e:
+                errors.append(e)
+                streamer.on_finalized_audio([], stream_end=True)
+
+        thread = threading.Thread(target=run_generation, daemon=True)
+        thread.start()
+        for chunk in streamer:
+            yield chunk
+        thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def generate_music_streaming(self, params: dict, on_chunk) -> str:
+        """
+        Streams the track through `on_chunk` as it is generated, then post-processes the
+        complete audio and saves it like `generate_music`. Returns the MP3 path.
+        A cache hit returns the stored track right away without streaming any chunks.
+        """
+        return self.generate_music_streaming_async(params, on_chunk).result()
+
+    @track_memory("generate_music_streaming")
+    def generate_music_streaming_async(self, params: dict, on_chunk) -> Future:
+        """
+        Non-blocking counterpart of `generate_music_streaming`: returns once the last chunk is
+        streamed, with a Future that resolves to the MP3 path once encoding completes.
+        """
+        import torch
+
+        metrics.inc("melodai_generation_requests_total", {"kind": "stream"})
+        self._duration(params)
+        prompt = self._create_prompt(params)
+        cache_key = self._cache_key(prompt, params)
+        cached_path = self._load_cached(cache_key, params, prompt)
+        if cached_path:
+            return self._completed(cached_path)
+
+        chunks = []
+        for chunk in self.stream_music(params):
+            chunks.append(chunk)
+            on_chunk(chunk)
+
+        audio_np = np.concatenate(chunks).astype(np.float32)
+        return self._process_and_save_audio_async(torch.from_numpy(audio_np), params, cache_key)
+
+    def stream_long_form(self, params: dict, total_seconds: float, cancel_event: threading.Event = None):
+        """
+        Generates a track longer than one MusicGen context in overlapping windows.
+        Each window after the first is conditioned on the last LONGFORM_CONTEXT_SECONDS of the
+        previous window and stitched to it with an equal-power crossfade.
+        Yields finished float32 segments, so peak memory does not grow with the track length.
+        Setting `cancel_event` stops the current window and raises GenerationCancelled.
+        The total length is written to params['track_seconds'] so a stored blueprint recreates it.
+        """
+        sr = Config.SAMPLING_RATE
+        window_seconds = Config.LONGFORM_WINDOW_SECONDS
+        context_seconds = Config.LONGFORM_CONTEXT_SECONDS
+        crossfade = int(Config.LONGFORM_CROSSFADE_SECONDS * sr)
+        total_seconds = min(total_seconds, Config.LONGFORM_MAX_SECONDS)
+        params['track_seconds'] = total_seconds
+
+        prompt = self._create_prompt(params)
+        print(f"🎵 Generating {total_seconds:.0f}s long-form track with prompt: {prompt}")
+
+        # Without a cancel event the windows go straight to `_generate_audio`
+        generate_window = functools.partial(self._generate_audio, tier=self._tier(params))
+        if cancel_event is not None:
+            generate_window = functools.partial(
+                self._generate_controlled, cancel_event=cancel_event, tier=self._tier(params)
+            )
+
+        first_seconds = min(window_seconds, total_seconds)
+        # Each window draws from its own seed, derived from the composition seed
+        seed = params.get('seed')
+        window_index = 0
+        window = generate_window([prompt], num_tokens=int(first_seconds * 50), seeds=[seed])
+        window = window.squeeze().float().cpu().numpy()
+        generated_seconds = first_seconds
+
+        # The last `crossfade` samples are held back to be blended with the next window
+        # (sliced by length, so a crossfade of 0 holds back nothing)
+        yield window[:len(window) - crossfade]
+        held = window[len(window) - crossfade:].copy()
+
+        while generated_seconds < total_seconds:
+            step_seconds = min(window_seconds - context_seconds, total_seconds - generated_seconds)
+            step_seconds = max(step_seconds, Config.LONGFORM_CROSSFADE_SECONDS)
+            context = window[-int(context_seconds * sr):]
+
+            window_index += 1
+            window = generate_window(
+                [prompt], num_tokens=int(step_seconds * 50), audio_prompt=context,
+                seeds=[None if seed is None else seed + window_index]
+            )
+            window = window.squeeze().float().cpu().numpy()
+            generated_seconds += step_seconds
+
+            # The output starts with the re-decoded context; keep only its last `crossfade` samples
+            new_audio = window[len(context) - crossfade:]
+            yield audio_processing.equal_power_crossfade(held, new_audio)
+            yield new_audio[crossfade:len(new_audio) - crossfade]
+            held = new_audio[len(new_audio) - crossfade:].copy()
+
+        yield held
+
+    @track_memory("generate_long_form")
+    def generate_long_form(self, params: dict, total_seconds: float, on_chunk=None,
+                           cancel_event: threading.Event = None) -> str:
+        """
+        Generates a multi-minute track window by window and pipes every finished segment
+        straight into ffmpeg, writing the MP3 to a unique output file. Loudness gain is taken
+        from the first window so later segments can be processed without the whole track.
+        Returns the MP3 path.
+        """
+        metrics.inc("melodai_generation_requests_total", {"kind": "long_form"})
+        output_dir = Path("output")
+        output_dir.mkdir(exist_ok=True)
+        audio_path = output_dir / f"track_{uuid.uuid4().hex}.mp3"
+
+        command = [
+            find_ffmpeg(), "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "s16le", "-ar", str(Config.SAMPLING_RATE), "-ac", "1", "-i", "pipe:0",
+            "-f", "mp3", "-b:a", self._tier(params)['bitrate'], str(audio_path)
+        ]
+        encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        gain = None
+        pending = None
+        try:
+            for segment in self.stream_long_form(params, total_seconds, cancel_event):
+                if on_chunk is not None:
+                    on_chunk(segment)
+                segment = np.array(segment, dtype=np.float32)
+
+                if gain is None:
+                    audio_processing.remove_dc(segment)
+                    gain = audio_processing.loudness_gain(
+                        segment, Config.SAMPLING_RATE,
+                        audio_processing.energy_to_loudness_target(params.get('energy_level', 5)),
+                        Config.PEAK_CEILING_DBFS
+                    )
+                    audio_processing.apply_fades(segment, Config.SAMPLING_RATE, Config.FADE_IN_SECONDS, 0)
+                segment *= gain
+
+                # Keep one segment back so the fade-out can be applied to the last one
+                if pending is not None:
+                    encoder.stdin.write(audio_processing.to_int16(pending).tobytes())
+                pending = segment
+
+            if pending is not None:
+                audio_processing.apply_fades(pending, Config.SAMPLING_RATE, 0, Config.FADE_OUT_SECONDS)
+                encoder.stdin.write(audio_processing.to_int16(pending).tobytes())
+            encoder.stdin.close()
+        except Exception:
+            encoder.kill()
+            encoder.wait()
+            audio_path.unlink(missing_ok=True)
+            raise
+
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to encode MP3: {encoder.stderr.read().decode(errors='replace').strip()}")
+
+        print(f"✅ Long-form audio exported successfully to {audio_path}")
+        return str(audio_path)
+
+    def generate_batch(self, params_list: list) -> list:
+        """
+        Generates one track per parameter set with a single batched `generate` call.
+        Returns the MP3 paths in the same order as `params_list`.
+        """
+        return [future.result() for future in self.generate_batch_async(params_list)]
+
+    @track_memory("generate_batch")
+    def generate_batch_async(self, params_list: list, progress_callbacks: list = None) -> list:
+        """
+        Batched counterpart of `generate_music_async`: runs one `generate` call per quality tier
+        in the batch and returns one Future per parameter set, in input order.
+        Requests found in the generation cache are served directly and left out of the batch.
+        `progress_callbacks` optionally holds one callback (or None) per parameter set, each
+        receiving the decoded fraction of the shared `generate` call.
+        """
+        if not params_list:
+            return []
+
+        metrics.inc("melodai_generation_requests_total", {"kind": "batch"}, len(params_list))
+        futures = [None] * len(params_list)
+        # Tiers differ in checkpoint and generation settings, so each gets its own generate call
+        pending_by_tier = {}
+        for index, params in enumerate(params_list):
+            prompt = self._create_prompt(params)
+            self._duration(params)
+            cache_key = self._cache_key(prompt, params)
+            cached_path = self._load_cached(cache_key, params, prompt)
+            if cached_path:
+                futures[index] = self._completed(cached_path)
+            else:
+                pending_by_tier.setdefault(self._tier(params)['name'], []).append((index, prompt, cache_key))
+
+        for tier_name, pending in pending_by_tier.items():
+            self._generate_pending(params_list, pending, get_tier(tier_name), progress_callbacks, futures)
+        return futures
+
+    def _generate_pending(self, params_list: list, pending: list, tier: dict, progress_callbacks: list,
+                          futures: list):
+        """
+        Generates the uncached requests of one quality tier of a batch in a single `generate` call and
+        fills in their Futures.
+        """
+        print(f"🎵 Generating a batch of {len(pending)} tracks ({tier['name']} tier)")
+        # One generate call covers the longest duration; shorter requests are trimmed afterwards
+        durations = [params_list[index]['duration_seconds'] for index, _, _ in pending]
+        prompts = [prompt for _, prompt, _ in pending]
+        num_tokens = int(max(durations) * 50)
+        seeds = [params_list[index].get('seed') for index, _, _ in pending]
+
+        callbacks = []
+        if progress_callbacks:
+            callbacks = [progress_callbacks[index] for index, _, _ in pending if progress_callbacks[index]]
+        if callbacks:
+            def report(fraction):
+                for callback in callbacks:
+                    callback(fraction)
+            audio_values = self._generate_controlled(prompts, report, num_tokens=num_tokens, tier=tier, seeds=seeds)
+        else:
+            audio_values = self._generate_audio(prompts, num_tokens=num_tokens, tier=tier, seeds=seeds)
+
+        for audio_tensor, seconds, (index, _, cache_key) in zip(audio_values, durations, pending):
+            audio_tensor = audio_tensor[..., :int(seconds * Config.SAMPLING_RATE)]
+            futures[index] = self._process_and_save_audio_async(audio_tensor, params_list[index], cache_key)
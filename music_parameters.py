@@ -1,5 +1,6 @@
 import numpy as np
-import pandas as pd
+
+from metrics import metrics
 
 class MusicParameterProcessor:
     """
@@ -56,7 +57,7 @@ class MusicParameterProcessor:
             }
         }
     
-    def enhance_parameters(self, base_params):
+    def enhance_parameters(self, base_params, rng=None):
         """
         Enhances base music parameters with detailed music theory elements based on mood.
         Randomly selects a chord progression, scale, rhythmic pattern, and key from the mood mapping.
@@ -64,10 +65,12 @@ class MusicParameterProcessor:
         
         Args:
             base_params (dict): Dictionary with at least 'mood_category' and 'energy_level' keys.
+            rng (np.random.Generator): Source of the random choices; a fresh unseeded one if omitted.
         
         Returns:
             dict: Enhanced parameters including chord progression, scale, rhythm, key, dynamics, and texture.
         """
+        rng = rng if rng is not None else np.random.default_rng()
         mood = base_params["mood_category"]
         # Get mapping for the mood, default to 'calm' if not found
         mapping = self.mood_theory_mappings.get(mood, self.mood_theory_mappings["calm"])
@@ -75,10 +78,10 @@ class MusicParameterProcessor:
         enhanced = base_params.copy()
         # Randomly select indices/types for each parameter
         enhanced.update({
-            "chord_progression": np.random.choice(len(mapping["chord_progressions"])),  # index, will be replaced below
-            "scale_type": np.random.choice(mapping["scales"]),
-            "rhythmic_pattern": np.random.choice(mapping["rhythmic_patterns"]),
-            "suggested_key": np.random.choice(mapping["typical_keys"]),
+            "chord_progression": int(rng.choice(len(mapping["chord_progressions"]))),  # index, will be replaced below
+            "scale_type": str(rng.choice(mapping["scales"])),
+            "rhythmic_pattern": str(rng.choice(mapping["rhythmic_patterns"])),
+            "suggested_key": str(rng.choice(mapping["typical_keys"])),
             "dynamics": self.map_energy_to_dynamics(base_params["energy_level"]),
             "texture": self.map_energy_to_texture(base_params["energy_level"])
         })
@@ -267,24 +270,37 @@ class MusicParameterProcessor:
         energy_category = "low" if energy <= 3 else "high" if energy >= 7 else "medium"
         return genre_map.get((mood, energy_category), ["contemporary", "crossover"])
     
-    def generate_advanced_parameters(self, base_params):
+    @metrics.span("parameter_enhancement")
+    def generate_advanced_parameters(self, base_params, seed=None):
         """
         Generate comprehensive advanced parameters for music composition.
+        All random choices come from a generator seeded with `seed`, so the same base parameters
+        and seed always give the same blueprint. The seed is stored in the result as "seed" and
+        is also used by MusicGenerator to sample the audio. "seed_pinned" records whether the
+        seed was given: only pinned seeds are part of the generation cache key.
         
         Args:
             base_params (dict): Basic parameters from mood analysis
+            seed (int): Seed for this composition; a random one is drawn if omitted
             
         Returns:
             dict: Comprehensive parameter set with advanced features
         """
-        enhanced = self.enhance_parameters(base_params)
+        seed_pinned = seed is not None
+        if seed is None:
+            seed = int(np.random.default_rng().integers(2**31))
+        rng = np.random.default_rng(seed)
+
+        enhanced = self.enhance_parameters(base_params, rng)
+        enhanced["seed"] = seed
+        enhanced["seed_pinned"] = seed_pinned
         mood = base_params["mood_category"]
         energy = base_params["energy_level"]
         
         # Add advanced parameters
         tempo_range = self.get_tempo_range(mood, energy)
         enhanced["tempo_range"] = tempo_range
-        enhanced["suggested_tempo"] = np.random.randint(tempo_range[0], tempo_range[1] + 1)
+        enhanced["suggested_tempo"] = int(rng.integers(tempo_range[0], tempo_range[1] + 1))
         
         # Update tempo in base params if it exists
         if "tempo" in enhanced:
@@ -294,7 +310,7 @@ class MusicParameterProcessor:
         enhanced["genre_suggestions"] = self.get_genre_suggestions(mood, energy)
         
         # Add time signature suggestions
-        enhanced["time_signature"] = self.get_time_signature(mood, energy)
+        enhanced["time_signature"] = self.get_time_signature(mood, energy, rng)
         
         # Add harmonic complexity
         enhanced["harmonic_complexity"] = self.get_harmonic_complexity(energy)
@@ -304,14 +320,15 @@ class MusicParameterProcessor:
         
         return enhanced
     
-    def get_time_signature(self, mood, energy):
+    def get_time_signature(self, mood, energy, rng=None):
         """Get appropriate time signature based on mood and energy."""
+        rng = rng if rng is not None else np.random.default_rng()
         if mood in ["romantic", "calm"]:
-            return np.random.choice(["4/4", "3/4", "6/8"], p=[0.5, 0.3, 0.2])
+            return str(rng.choice(["4/4", "3/4", "6/8"], p=[0.5, 0.3, 0.2]))
         elif mood == "energetic" and energy >= 7:
-            return np.random.choice(["4/4", "7/8", "5/4"], p=[0.7, 0.2, 0.1])
+            return str(rng.choice(["4/4", "7/8", "5/4"], p=[0.7, 0.2, 0.1]))
         elif mood == "mysterious":
-            return np.random.choice(["4/4", "5/4", "7/8", "3/4"], p=[0.4, 0.3, 0.2, 0.1])
+            return str(rng.choice(["4/4", "5/4", "7/8", "3/4"], p=[0.4, 0.3, 0.2, 0.1]))
         else:
             return "4/4"
     
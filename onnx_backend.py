@@ -0,0 +1,226 @@
+# onnx_backend.py
+#
+# Optional ONNX Runtime backend for MoodAnalyzer (Config.NLP_BACKEND = "onnx"). The sentiment
+# classifier and the sentence embedder are exported to ONNX once, optionally with int8 dynamic
+# quantization of their weights (Config.ONNX_QUANTIZE_INT8), and cached under Config.ONNX_CACHE_DIR
+# together with their tokenizers. Later starts load only the tokenizers (with the `tokenizers`
+# library, which unlike transformers' AutoTokenizer does not import torch) and ONNX Runtime sessions.
+#
+# OnnxSentimentPipeline and OnnxSentenceEncoder mirror the parts of the transformers pipeline and
+# SentenceTransformer interfaces that MoodAnalyzer uses, so the rest of the analyzer is unchanged.
+# Requires `pip install onnxruntime onnx`; torch is only needed for the first export.
+# Run benchmarks/check_onnx_parity.py after changing a model, and benchmarks/bench_onnx_backend.py
+# to compare latency with PyTorch.
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from config import Config
+
+OPSET_VERSION = 17
+# Bump when the layout or contents of an export folder change, so old exports are redone
+EXPORT_FORMAT_VERSION = 3
+# Models whose position ids start after the padding index, which leaves pad_token_id + 1 fewer
+# usable positions than max_position_embeddings (514 positions hold 512 tokens)
+OFFSET_POSITION_MODEL_TYPES = {"roberta", "xlm-roberta", "camembert", "longformer"}
+
+
+def _model_dir(kind, model_name):
+    """Cache folder of one exported model, named after its kind and the source model name."""
+    model_hash = hashlib.sha256(str(model_name).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(Config.ONNX_CACHE_DIR, f"{kind}-v{EXPORT_FORMAT_VERSION}-{model_hash}")
+
+
+def _save_tokenizer(tokenizer, directory, max_length):
+    """
+    Saves a (fast) transformers tokenizer with the padding and truncation settings `_Tokenizer` needs.
+    """
+    if not tokenizer.is_fast:
+        raise ValueError(f"{tokenizer.name_or_path} has no fast tokenizer, which the ONNX backend needs")
+    tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, "tokenizer_settings.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "pad_token": tokenizer.pad_token, "pad_token_id": tokenizer.pad_token_id, "max_length": int(max_length)
+        }, f)
+
+
+class _Tokenizer:
+    """
+    Batch tokenization to numpy with padding and truncation, from the tokenizer.json of an export.
+    """
+    def __init__(self, model_dir):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "tokenizer_settings.json"), encoding="utf-8") as f:
+            settings = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_padding(pad_id=settings["pad_token_id"], pad_token=settings["pad_token"])
+        self.tokenizer.enable_truncation(max_length=settings["max_length"])
+
+    def __call__(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        return {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+
+
+def _session(model_dir, quantize):
+    """
+    ONNX Runtime session for the exported graph in `model_dir`, quantizing it to int8 first if
+    requested and not done yet.
+    """
+    import onnxruntime
+
+    path = os.path.join(model_dir, "model.onnx")
+    if quantize:
+        quantized_path = os.path.join(model_dir, "model-int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            temporary = f"{quantized_path}.{os.getpid()}.tmp"
+            quantize_dynamic(path, temporary, weight_type=QuantType.QInt8)
+            os.replace(temporary, quantized_path)
+            print(f"✅ Quantized {path} to int8")
+        path = quantized_path
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def _export(module, example_inputs, input_names, output_name, model_dir, save_extras):
+    """
+    Exports `module` to model_dir/model.onnx with dynamic batch and sequence axes. The folder is
+    written under a temporary name and renamed once complete, so a crash never leaves half an export.
+    """
+    import torch
+
+    temporary = f"{model_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            module, tuple(example_inputs[name] for name in input_names), os.path.join(temporary, "model.onnx"),
+            input_names=input_names, output_names=[output_name], dynamic_axes=dynamic_axes,
+            opset_version=OPSET_VERSION, dynamo=False
+        )
+    save_extras(temporary)
+    if os.path.exists(model_dir):
+        shutil.rmtree(temporary)
+    else:
+        os.replace(temporary, model_dir)
+    print(f"✅ Exported ONNX model to {model_dir}")
+
+
+class OnnxSentimentPipeline:
+    """
+    Sentiment classification with ONNX Runtime. Called like the transformers "sentiment-analysis"
+    pipeline: a string or list of strings in, a list of {"label", "score"} dicts out.
+    """
+    def __init__(self, model_dir, quantize=False):
+        self.tokenizer = _Tokenizer(model_dir)
+        with open(os.path.join(model_dir, "labels.json"), encoding="utf-8") as f:
+            self.id2label = {int(key): label for key, label in json.load(f).items()}
+        self.session = _session(model_dir, quantize)
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    @classmethod
+    def load(cls, model_name, quantize=False):
+        """
+        Loads the cached export of `model_name`, exporting it from PyTorch first if needed.
+        """
+        model_dir = _model_dir("sentiment", model_name)
+        if not os.path.exists(os.path.join(model_dir, "model.onnx")):
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+            model.config.return_dict = False
+            example = tokenizer(["an example sentence"], return_tensors="pt")
+            input_names = [name for name in tokenizer.model_input_names if name in example]
+
+            def save_extras(directory):
+                positions = model.config.max_position_embeddings
+                if model.config.model_type in OFFSET_POSITION_MODEL_TYPES:
+                    positions -= model.config.pad_token_id + 1
+                max_length = min(tokenizer.model_max_length, positions)
+                _save_tokenizer(tokenizer, directory, max_length)
+                with open(os.path.join(directory, "labels.json"), "w", encoding="utf-8") as f:
+                    json.dump(model.config.id2label, f)
+
+            _export(model, example, input_names, "logits", model_dir, save_extras)
+        return cls(model_dir, quantize)
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or len(texts) or 1
+        results = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size])
+            logits = self.session.run(None, {name: tokens[name] for name in self.input_names})[0]
+            # Same post-processing as the pipeline: softmax, then the most likely label
+            probabilities = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probabilities /= probabilities.sum(axis=-1, keepdims=True)
+            for row in probabilities:
+                best = int(row.argmax())
+                results.append({"label": self.id2label[best], "score": float(row[best])})
+        return results
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence embeddings with ONNX Runtime. The exported graph includes the SentenceTransformer's
+    pooling and normalization, so `encode` returns the same vectors as SentenceTransformer.encode.
+    """
+    def __init__(self, model_dir, quantize=False):
+        self.tokenizer = _Tokenizer(model_dir)
+        self.session = _session(model_dir, quantize)
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    @classmethod
+    def load(cls, model_name, quantize=False):
+        """
+        Loads the cached export of `model_name`, exporting it from PyTorch first if needed.
+        """
+        model_dir = _model_dir("embedding", model_name)
+        if not os.path.exists(os.path.join(model_dir, "model.onnx")):
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device="cpu").eval()
+            tokenizer = model.tokenizer
+            example = tokenizer(["an example sentence"], return_tensors="pt")
+            input_names = [name for name in tokenizer.model_input_names if name in example]
+
+            class SentenceEmbedding(torch.nn.Module):
+                # Positional inputs for the exporter, passed on as the features dict SentenceTransformer expects
+                def __init__(self):
+                    super().__init__()
+                    self.model = model
+
+                def forward(self, *inputs):
+                    return self.model(dict(zip(input_names, inputs)))["sentence_embedding"]
+
+            def save_extras(directory):
+                _save_tokenizer(tokenizer, directory, model.max_seq_length or tokenizer.model_max_length)
+
+            _export(SentenceEmbedding(), example, input_names, "sentence_embedding", model_dir, save_extras)
+        return cls(model_dir, quantize)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size])
+            embeddings.append(self.session.run(None, {name: tokens[name] for name in self.input_names})[0])
+        embeddings = np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
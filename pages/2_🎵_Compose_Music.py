@@ -1,11 +1,18 @@
 import streamlit as st
 from ui_utils import load_theme
-from mood_analyzer import MoodAnalyzer
-from music_parameters import MusicParameterProcessor
-from music_generator import MusicGenerator
+from config import Config
+import model_loader
+from job_client import JobClient
+from quality_tiers import get_tier, measured_latency, tier_names
 from auth import UserAuth, init_session_state, require_auth
+from metrics import metrics
+import memory_tracker
+import uuid
+import queue
+from concurrent.futures import wait
 import time
 import os
+import numpy as np
 
 load_theme()
 init_session_state()
@@ -21,15 +28,16 @@ if 'track_generated' not in st.session_state:
     st.session_state.audio_path = None
 if "mood_input" not in st.session_state:
     st.session_state.mood_input = ""
+if "active_job" not in st.session_state:
+    st.session_state.active_job = None
 
 # --- MODEL LOADING ---
 @st.cache_resource
 def load_models():
+    if model_loader.is_ready():
+        return model_loader.get_models()
     with st.spinner("Warming up the AI studio... This might take a moment."):
-        analyzer = MoodAnalyzer()
-        processor = MusicParameterProcessor()
-        generator = MusicGenerator()
-    return analyzer, processor, generator
+        return model_loader.get_models()
 
 # --- UI DISPLAY FUNCTIONS ---
 def display_musical_blueprint(params):
@@ -130,16 +138,109 @@ def display_audio_player(audio_path):
     except Exception as e:
         st.error(f"An error occurred while loading the audio: {e}")
 
+def compose_with_preview(generate_fn, total_seconds, full_preview=True, on_progress=None):
+    """
+    Stream the track into a preview player so playback starts with the first chunk.
+    `generate_fn` receives the chunk callback and returns the final audio path.
+    Long-form tracks only preview the newest segment to keep the page's memory bounded.
+    `on_progress` receives the composed fraction of the track after every chunk.
+    """
+    status_line = st.empty()
+    preview = st.empty()
+    chunks = []
+    seconds_ready = 0.0
+
+    def show_chunk(chunk):
+        nonlocal seconds_ready
+        seconds_ready += len(chunk) / Config.SAMPLING_RATE
+        if full_preview:
+            chunks.append(chunk)
+            preview_audio = np.concatenate(chunks)
+        else:
+            preview_audio = chunk
+        status_line.caption(f"🎧 Preview: {seconds_ready:.0f}s of {total_seconds}s composed")
+        if on_progress is not None:
+            on_progress(min(1.0, seconds_ready / total_seconds))
+        if len(preview_audio):
+            preview.audio(preview_audio, sample_rate=Config.SAMPLING_RATE)
+
+    audio_path = generate_fn(show_chunk)
+    status_line.empty()
+    preview.empty()
+    return audio_path
+
+def generate_with_progress(batcher, params, on_progress, on_chunk=None):
+    """
+    Queue the track on the shared batcher and wait for it on the script thread, passing on the
+    decoded fraction reported by the batcher thread (only the script thread may update the page).
+    With `on_chunk` the track is streamed when the batcher runs it alone; the chunks are handed
+    over to the script thread the same way. Batched with other sessions, it only reports progress.
+    """
+    progress = {"fraction": 0.0}
+    chunks = queue.SimpleQueue()
+
+    def record(fraction):
+        progress["fraction"] = fraction
+
+    future = batcher.submit(params, progress_callback=record, on_chunk=chunks.put if on_chunk else None)
+    while True:
+        done = wait([future], timeout=0.25).done
+        while not chunks.empty():
+            on_chunk(chunks.get())
+        if done:
+            break
+        # Streamed tracks report their progress through the chunks
+        if progress["fraction"]:
+            on_progress(progress["fraction"])
+    return future.result()
+
+def follow_job(job_client, job_id):
+    """
+    Poll a job on the job server and show its progress until it finishes.
+    The job keeps running on the server if the page is refreshed or left; coming back resumes following it.
+    """
+    with st.status("Your personal composer is at work...", expanded=True) as status:
+        stage_line = st.empty()
+        progress_bar = st.progress(0.0)
+        if st.button("✖️ Cancel", key=f"cancel_{job_id}"):
+            job_client.cancel(job_id)
+
+        while True:
+            job = job_client.get(job_id)
+            if job["status"] == "queued":
+                stage_line.write(f"⏳ Waiting in queue ({job.get('queue_position', 0)} ahead)...")
+            else:
+                stage_line.write(f"🎶 {job['stage']}...")
+            progress_bar.progress(min(1.0, job["progress"]))
+            if job["status"] in ("completed", "failed", "cancelled"):
+                break
+            time.sleep(Config.JOB_POLL_SECONDS)
+
+        st.session_state.active_job = None
+        if job["status"] == "completed":
+            st.session_state.track_generated = True
+            st.session_state.enhanced_params = job["params"]
+            st.session_state.audio_path = job["audio_path"]
+            status.update(label="✅ Composition Complete!", state="complete", expanded=False)
+        elif job["status"] == "cancelled":
+            status.update(label="Composition cancelled", state="error", expanded=False)
+        else:
+            status.update(label="Composition failed", state="error", expanded=False)
+    return job
+
 # --- PAGE LAYOUT ---
 user_info = st.session_state.user_info
 st.markdown(f"<h1>Welcome to your Studio, {user_info['full_name']}! 🎼</h1>", unsafe_allow_html=True)
 st.markdown("<h2>Let's create something amazing together.</h2>", unsafe_allow_html=True)
 
-try:
-    analyzer, processor, generator = load_models()
-except Exception as e:
-    st.error(f"A critical error occurred while loading AI models: {e}")
-    st.stop()
+# With a job server configured the models live in that process and this page only submits jobs
+job_client = JobClient() if Config.JOB_SERVER_URL else None
+if job_client is None:
+    try:
+        analyzer, processor, batcher = load_models()
+    except Exception as e:
+        st.error(f"A critical error occurred while loading AI models: {e}")
+        st.stop()
 
 # --- COMPOSER INPUT (No unnecessary containers) ---
 def set_prompt(prompt):
@@ -163,18 +264,101 @@ cols[3].button("🧘 Calm Piano", on_click=set_prompt, args=("Calm, peaceful, am
 
 st.markdown("<br>", unsafe_allow_html=True)
 
-if st.button("✨ Compose My Track ✨", use_container_width=True, type="primary"):
-    if st.session_state.mood_input.strip():
+# Latencies published by benchmarks/bench_suite.py --publish-tiers; tiny-model timings are not shown
+tier_latency = measured_latency()
+if tier_latency is not None and tier_latency.get("models") != "real":
+    tier_latency = None
+
+def tier_label(name):
+    tier = get_tier(name)
+    label = f"{tier['label']} ({tier['duration_seconds']:.0f}s"
+    measured = (tier_latency or {}).get("tiers", {}).get(name)
+    if measured:
+        label += f", ~{measured['p50_seconds']:.0f}s to compose"
+    return label + ")"
+
+quality_tier = st.radio(
+    "🎚️ Quality", options=tier_names(), index=tier_names().index(Config.DEFAULT_QUALITY_TIER),
+    format_func=tier_label, horizontal=True,
+    help=" · ".join(f"{get_tier(name)['label']}: {get_tier(name)['description']}" for name in tier_names())
+)
+tier_seconds = get_tier(quality_tier)['duration_seconds']
+
+track_lengths = [tier_seconds] + [s for s in (30, 60, 120, 180, 300)
+                                  if tier_seconds < s <= Config.LONGFORM_MAX_SECONDS]
+track_seconds = st.select_slider(
+    "⏱️ Track length", options=track_lengths, value=tier_seconds,
+    format_func=lambda seconds: f"{seconds // 60}:{seconds % 60:02d}",
+    help="Tracks longer than the tier's length are composed in overlapping windows and take proportionally longer."
+)
+
+# Set by "Recreate" on the History page: the stored blueprint and seed reproduce the track without re-analysis
+recreate_params = st.session_state.pop("recreate_params", None)
+
+if st.button("✨ Compose My Track ✨", use_container_width=True, type="primary") or recreate_params:
+    if st.session_state.mood_input.strip() and job_client is not None:
+        st.session_state.track_generated = False
+        try:
+            job = job_client.submit(
+                st.session_state.mood_input, track_seconds=track_seconds, user_id=user_info['id'],
+                params=recreate_params, quality_tier=quality_tier
+            )
+            st.session_state.active_job = job["id"]
+        except Exception as e:
+            st.error(f"😔 Oops! An error occurred: {e}")
+    elif st.session_state.mood_input.strip():
         st.session_state.track_generated = False
+        memory_tracker.set_request_id(uuid.uuid4().hex[:12])
         try:
             with st.status("Your personal composer is at work...", expanded=True) as status:
-                status.write("🧠 Analyzing emotional tone...")
-                base_params = analyzer.analyze_mood(st.session_state.mood_input)
-                time.sleep(0.5); status.write("🎼 Building the musical blueprint...")
-                enhanced_params = processor.generate_advanced_parameters(base_params)
-                time.sleep(0.5); status.write("🎶 Composing your track... This is the magic part!")
-                audio_path = generator.generate_music(enhanced_params)
+                progress_bar = st.progress(0.0)
+                started = time.perf_counter()
+                if recreate_params:
+                    status.write("🔁 Reusing the stored blueprint and seed...")
+                    enhanced_params = recreate_params
+                    enhanced_params["seed_pinned"] = True
+                else:
+                    status.write("🧠 Analyzing emotional tone...")
+                    base_params = analyzer.analyze_mood(st.session_state.mood_input)
+                    progress_bar.progress(0.08)
+                    status.write(f"🎼 Building the musical blueprint... (analysis took {time.perf_counter() - started:.1f}s)")
+                    enhanced_params = processor.generate_advanced_parameters(base_params)
+                    enhanced_params["quality_tier"] = quality_tier
+                # A recreated blueprint keeps the tier and length it was composed at, whatever the page shows
+                tier_seconds = get_tier(enhanced_params.get("quality_tier"))['duration_seconds']
+                if recreate_params:
+                    track_seconds = recreate_params.get("track_seconds") or tier_seconds
+                progress_bar.progress(0.1)
+                status.write("🎶 Composing your track... This is the magic part!")
+                compose_started = time.perf_counter()
+
+                def show_progress(fraction):
+                    # Decoding is the bulk of the wait: it fills the bar from 10% to 95%
+                    progress_bar.progress(min(1.0, 0.1 + 0.85 * fraction))
 
+                generator = batcher.generator
+                # Fresh blueprints (and recreated library tracks) can be answered from the pre-rendered library
+                library_path = None
+                if track_seconds == tier_seconds and (not recreate_params or recreate_params.get("library_id")):
+                    library_path = generator.serve_from_library(enhanced_params)
+
+                if library_path:
+                    audio_path = library_path
+                elif track_seconds > tier_seconds:
+                    audio_path = compose_with_preview(
+                        lambda on_chunk: generator.generate_long_form(enhanced_params, track_seconds, on_chunk=on_chunk),
+                        track_seconds, full_preview=False, on_progress=show_progress
+                    )
+                elif Config.STREAMING_PLAYBACK:
+                    audio_path = compose_with_preview(
+                        lambda on_chunk: generate_with_progress(batcher, enhanced_params, show_progress, on_chunk),
+                        tier_seconds, on_progress=show_progress
+                    )
+                else:
+                    audio_path = generate_with_progress(batcher, enhanced_params, show_progress)
+
+                progress_bar.progress(0.95)
+                status.write(f"💾 Saving to your history... (composing took {time.perf_counter() - compose_started:.1f}s)")
                 # Save to user history
                 audio_filename = os.path.basename(audio_path) if audio_path else None
                 auth.save_music_history(
@@ -187,19 +371,40 @@ if st.button("✨ Compose My Track ✨", use_container_width=True, type="primary
                 st.session_state.track_generated = True
                 st.session_state.enhanced_params = enhanced_params
                 st.session_state.audio_path = audio_path
-                status.update(label="✅ Composition Complete!", state="complete", expanded=False)
+                progress_bar.progress(1.0)
+                status.update(label=f"✅ Composition Complete! ({time.perf_counter() - started:.1f}s)", state="complete", expanded=False)
+            metrics.inc("melodai_compositions_total", {"status": "completed"})
             st.balloons()
             st.success("🎉 Your composition has been saved to your history!")
         except Exception as e:
+            metrics.inc("melodai_compositions_total", {"status": "failed"})
             st.error(f"😔 Oops! An error occurred: {e}")
             st.session_state.track_generated = False
+        finally:
+            metrics.write_file()
     else:
         st.warning("Please describe the music you want to create.")
         st.session_state.track_generated = False
 
+if job_client is not None and st.session_state.active_job:
+    try:
+        job = follow_job(job_client, st.session_state.active_job)
+        if job["status"] == "completed":
+            st.balloons()
+            st.success("🎉 Your composition has been saved to your history!")
+        elif job["status"] == "failed":
+            st.error(f"😔 Oops! An error occurred: {job['error']}")
+    except Exception as e:
+        st.error(f"😔 Oops! An error occurred: {e}")
+        st.session_state.active_job = None
+
 # --- RESULTS AREA (No unnecessary containers) ---
 if st.session_state.track_generated:
     st.markdown("<h3>Your AI-Generated Composition</h3>", unsafe_allow_html=True)
+    composed_tier_seconds = get_tier(st.session_state.enhanced_params.get("quality_tier"))['duration_seconds']
+    composed_seconds = st.session_state.enhanced_params.get("duration_seconds", composed_tier_seconds)
+    if composed_seconds < composed_tier_seconds:
+        st.info(f"⏱️ The studio is busy right now, so this track was composed at {composed_seconds:.0f}s to keep wait times short.")
     col1, col2 = st.columns([2, 1], gap="large")
     with col1:
         display_musical_blueprint(st.session_state.enhanced_params)
@@ -198,8 +198,11 @@ else:
                 action_cols = st.columns([1, 1, 1, 2])
                 
                 with action_cols[0]:
-                    if st.button("🔄 Recreate", key=f"recreate_{i}", use_container_width=True):
+                    if st.button("🔄 Recreate", key=f"recreate_{i}", use_container_width=True,
+                                 help="Regenerates this exact track from its stored blueprint and seed"):
                         st.session_state.mood_input = item['prompt']
+                        # Older entries have no stored blueprint and are composed again from the prompt
+                        st.session_state.recreate_params = item['params']
                         st.switch_page("pages/2_🎵_Compose_Music.py")
                 
                 with action_cols[1]:
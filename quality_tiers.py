@@ -0,0 +1,47 @@
+# quality_tiers.py
+#
+# This module resolves the quality tiers defined in Config.QUALITY_TIERS (draft / standard / high)
+# into concrete generation settings, and reads the per-tier latency measured by
+# benchmarks/bench_suite.py --publish-tiers so the Compose page can show what each tier costs.
+
+import json
+import os
+
+from config import Config
+
+# Generation config fields a tier overrides on the checkpoint's defaults
+SAMPLING_FIELDS = ("do_sample", "top_k", "top_p", "temperature", "guidance_scale")
+
+
+def tier_names():
+    return list(Config.QUALITY_TIERS)
+
+
+def get_tier(name=None):
+    """
+    Returns the settings of tier `name` (default Config.DEFAULT_QUALITY_TIER) with the defaults
+    filled in: "model" is the checkpoint to load and "duration_seconds" the track length.
+    """
+    name = name or Config.DEFAULT_QUALITY_TIER
+    if name not in Config.QUALITY_TIERS:
+        raise ValueError(f"Unknown quality tier: {name} (expected one of {', '.join(Config.QUALITY_TIERS)})")
+    tier = dict(Config.QUALITY_TIERS[name], name=name)
+    tier["model"] = tier.get("model") or Config.MUSIC_GEN_MODEL
+    tier["duration_seconds"] = tier.get("duration_seconds") or Config.AUDIO_DURATION_SECONDS
+    return tier
+
+
+def measured_latency(path=None):
+    """
+    Returns the published tier latencies ({"models": ..., "tiers": {name: {...}}}), or None when
+    they have not been measured yet.
+    """
+    path = path or Config.TIER_LATENCY_FILE
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read tier latencies from {path}: {e}")
+        return None
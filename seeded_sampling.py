@@ -0,0 +1,58 @@
+# seeded_sampling.py
+#
+# Reproducible MusicGen sampling with one torch.Generator per request. `generate` samples with
+# torch.multinomial on the global RNG, which cannot be seeded per request inside a batch. Instead,
+# this logits processor applies guidance, temperature, top-k and top-p itself and adds Gumbel noise
+# drawn from each request's generator; the argmax of those scores is an exact sample from the
+# filtered distribution, so `generate` runs greedily and the result depends only on the seeds.
+
+import torch
+from transformers import LogitsProcessor, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper
+
+
+class SeededSampler(LogitsProcessor):
+    """
+    Gumbel-max sampling with per-request generators. Use with `do_sample=False`.
+    """
+    def __init__(self, seeds, num_codebooks, generation_config, device="cpu"):
+        """
+        Args:
+            seeds (list): One integer seed per request in the batch.
+            num_codebooks (int): Rows of the score matrix that belong to each request.
+            generation_config: The model's generation config, for guidance and sampling settings.
+        """
+        self.num_codebooks = num_codebooks
+        self.generators = [torch.Generator(device=device).manual_seed(int(seed)) for seed in seeds]
+        self.guidance_scale = generation_config.guidance_scale
+
+        self.warpers = []
+        if generation_config.temperature is not None and generation_config.temperature != 1.0:
+            self.warpers.append(TemperatureLogitsWarper(generation_config.temperature))
+        if generation_config.top_k:
+            self.warpers.append(TopKLogitsWarper(generation_config.top_k))
+        if generation_config.top_p is not None and 0 < generation_config.top_p < 1:
+            self.warpers.append(TopPLogitsWarper(generation_config.top_p))
+
+    def __call__(self, input_ids, scores):
+        rows = len(self.generators) * self.num_codebooks
+        # With classifier-free guidance enabled, `generate` runs its guidance processor after this one
+        # on stacked conditional/unconditional scores. Guidance is applied here instead, and both halves
+        # are returned identical so the later guidance step leaves the sampled scores unchanged.
+        guided = scores.shape[0] == 2 * rows
+        if guided:
+            cond, uncond = scores.float().split(rows, dim=0)
+            scores = uncond + (cond - uncond) * self.guidance_scale
+        else:
+            scores = scores.float()
+
+        for warper in self.warpers:
+            scores = warper(input_ids, scores)
+        scores = torch.log_softmax(scores, dim=-1)
+
+        noise = torch.cat([
+            torch.rand((self.num_codebooks, scores.shape[-1]), generator=generator, device=scores.device)
+            for generator in self.generators
+        ])
+        scores = scores - torch.log(-torch.log(noise.clamp_(1e-10, 1.0 - 1e-7)))
+
+        return torch.cat([scores, scores]) if guided else scores
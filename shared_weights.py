@@ -0,0 +1,100 @@
+# shared_weights.py
+#
+# Lets several server processes share one physical copy of the model weights. Each model's state
+# dict is exported once to a safetensors file; every process then memory-maps that file and points
+# its parameters at the mapping, so the OS page cache backs all workers with the same pages.
+
+import json
+import mmap
+import os
+import re
+import threading
+from pathlib import Path
+
+import torch
+
+from config import Config
+
+# safetensors dtype names -> torch dtypes
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+# Keep the maps alive for as long as the tensors that view them
+_open_maps = []
+_export_lock = threading.Lock()
+
+
+def weights_path(model_name):
+    """
+    Location of the exported weights for `model_name` inside Config.SHARED_WEIGHTS_DIR.
+    """
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name)
+    return Path(Config.SHARED_WEIGHTS_DIR) / f"{safe_name}.safetensors"
+
+
+def export_weights(module, path):
+    """
+    Write the module's parameters and persistent buffers to a safetensors file.
+    Written to a temporary file first so workers starting at the same time never read a partial file.
+    """
+    from safetensors.torch import save_model
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    save_model(module, str(tmp_path))
+    os.replace(tmp_path, path)
+    print(f"✅ Exported shared weights to {path}")
+
+
+def load_mmap_state_dict(path):
+    """
+    Memory-map a safetensors file and return tensors that view the mapping without copying.
+    The map is private copy-on-write: pages stay shared between processes unless written to.
+    """
+    with open(path, "rb") as f:
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    _open_maps.append(mapped)
+
+    data_start = 8 + header_size
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + start)
+        state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict
+
+
+def share_weights(module, model_name):
+    """
+    Replace the module's parameters and buffers with views of the shared weights file,
+    exporting the file first if no worker has done so yet. The private copies loaded by
+    `from_pretrained` are released once nothing else references them.
+    Returns the number of tensors that were re-pointed.
+    """
+    path = weights_path(model_name)
+    with _export_lock:
+        if not path.exists():
+            export_weights(module, path)
+
+    state_dict = load_mmap_state_dict(path)
+    shared = 0
+    with torch.no_grad():
+        for name, tensor in list(module.named_parameters()) + list(module.named_buffers()):
+            mapped = state_dict.get(name)
+            if mapped is None or mapped.shape != tensor.shape or mapped.dtype != tensor.dtype:
+                continue
+            tensor.data = mapped
+            shared += 1
+
+    print(f"✅ {model_name}: {shared} tensors backed by shared memory-mapped weights")
+    return shared
@@ -0,0 +1,119 @@
+# token_budget.py
+#
+# This module defines the TokenBudgetController, which picks how many seconds of audio MusicGen
+# generates for each request. It measures live decoding throughput and the number of requests
+# waiting, and chooses the longest duration whose predicted latency still meets the p95 target,
+# so load spikes shorten tracks instead of growing the queue without bound.
+
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from config import Config
+
+TOKENS_PER_SECOND_OF_AUDIO = 50  # MusicGen token frame rate
+
+
+class TokenBudgetController:
+    """
+    Chooses a per-request audio duration from measured tokens/s and queue depth.
+    Throughput is taken at the slow end of recent measurements (10th percentile), so the
+    predicted latency is an estimate of the p95 rather than the average. Measurements are kept
+    per profile (the quality tier), since tiers differ in checkpoint and guidance cost.
+    """
+    def __init__(self, target_p95_seconds=None, min_seconds=None, window=50):
+        self.target_p95_seconds = target_p95_seconds or Config.LATENCY_TARGET_P95_SECONDS
+        self.min_seconds = min_seconds or Config.MIN_AUDIO_DURATION_SECONDS
+        self._lock = threading.Lock()
+        self.window = window
+        self._tokens_per_second = {}
+        self._generate_seconds = {}
+        self._queue_sources = []
+        self.decisions = deque(maxlen=200)
+
+    def add_queue_source(self, source):
+        """
+        Register a callable returning the number of requests waiting for or in generation,
+        e.g. the dynamic batcher's queue or the generator's active requests. The queue depth
+        is the sum over all sources.
+        """
+        self._queue_sources.append(source)
+
+    def queue_depth(self):
+        return sum(source() for source in self._queue_sources)
+
+    def record(self, num_tokens, seconds, profile=None):
+        """
+        Record one finished generate call of `profile`: `num_tokens` frames per sequence in `seconds`.
+        """
+        if seconds <= 0 or num_tokens <= 0:
+            return
+        with self._lock:
+            self._tokens_per_second.setdefault(profile, deque(maxlen=self.window)).append(num_tokens / seconds)
+            self._generate_seconds.setdefault(profile, deque(maxlen=self.window)).append(seconds)
+
+    def choose(self, requested_seconds=None, target_seconds=None, profile=None):
+        """
+        Returns the audio duration in whole seconds for the next request of `profile`.
+        `requested_seconds` (the tier's length, defaulting to the app-wide track length) caps the
+        duration and `target_seconds` overrides the latency target for this request. The result
+        never goes below the floor, even if the target cannot be met.
+        """
+        requested = requested_seconds or Config.AUDIO_DURATION_SECONDS
+        target = target_seconds or self.target_p95_seconds
+        depth = self.queue_depth()
+
+        with self._lock:
+            if not self._tokens_per_second.get(profile):
+                # Nothing measured yet: no basis for shortening
+                return self._log(requested, requested, depth, target, None, None)
+            slow_tps = float(np.percentile(self._tokens_per_second[profile], 10))
+            job_seconds = float(np.mean(self._generate_seconds[profile]))
+
+        # Requests ahead are merged into batches, each taking about one generate call
+        expected_wait = math.ceil(depth / Config.BATCH_MAX_SIZE) * job_seconds
+        affordable = (target - expected_wait) * slow_tps / TOKENS_PER_SECOND_OF_AUDIO
+        seconds = max(self.min_seconds, min(requested, math.floor(affordable)))
+        predicted = expected_wait + seconds * TOKENS_PER_SECOND_OF_AUDIO / slow_tps
+        return self._log(seconds, requested, depth, target, slow_tps, predicted)
+
+    def _log(self, seconds, requested, depth, target, slow_tps, predicted):
+        decision = {
+            "time": time.time(),
+            "seconds": seconds,
+            "requested_seconds": requested,
+            "queue_depth": depth,
+            "target_p95_seconds": target,
+            "tokens_per_second_p10": slow_tps,
+            "predicted_latency_seconds": predicted,
+        }
+        self.decisions.append(decision)
+
+        if slow_tps is None:
+            print(f"⏱️ Token budget: {seconds}s (no throughput measured yet)")
+        else:
+            marker = "⚠️ load-limited" if seconds < requested else "✅"
+            print(
+                f"⏱️ Token budget: {seconds}s of {requested}s {marker} "
+                f"(queue {depth}, {slow_tps:.1f} tok/s p10, predicted {predicted:.1f}s vs target {target:.0f}s)"
+            )
+        return seconds
+
+    def stats(self):
+        """
+        Recent throughput and the share of decisions that shortened a track because of load.
+        """
+        with self._lock:
+            tps = [value for values in self._tokens_per_second.values() for value in values]
+            decisions = list(self.decisions)
+        shortened = sum(1 for decision in decisions if decision["seconds"] < decision["requested_seconds"])
+        return {
+            "tokens_per_second_avg": float(np.mean(tps)) if tps else 0.0,
+            "tokens_per_second_p10": float(np.percentile(tps, 10)) if tps else 0.0,
+            "decisions": len(decisions),
+            "shortened": shortened,
+            "last_seconds": decisions[-1]["seconds"] if decisions else None,
+        }
@@ -0,0 +1,173 @@
+# track_library.py
+#
+# This module defines the TrackLibrary class, an indexed collection of tracks pre-rendered offline by
+# build_library.py. Each track is filed under its blueprint (mood, energy band, key, scale and rhythm),
+# so a request whose blueprint matches can be answered instantly instead of running MusicGen. A
+# freshness and variety policy decides which of the matching tracks is served, if any.
+
+import json
+import random
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import Config
+
+
+def energy_band(energy_level):
+    """
+    Energy band with the same thresholds MusicGenerator uses to describe energy in the prompt.
+    """
+    return "high" if energy_level > 7 else "low" if energy_level < 4 else "medium"
+
+
+def blueprint_key(params):
+    """
+    The blueprint fields a library track must match to be served for a request.
+    """
+    return (
+        params["mood_category"],
+        energy_band(params["energy_level"]),
+        params["suggested_key"],
+        params["scale_type"],
+        params["rhythmic_pattern"],
+    )
+
+
+class TrackLibrary:
+    """
+    SQLite index plus MP3 files under Config.LIBRARY_DIR.
+    Serving policy: only entries newer than LIBRARY_MAX_AGE_DAYS and served fewer than
+    LIBRARY_MAX_SERVES times are eligible, and the least served of those is picked (ties at
+    random), so repeated requests rotate through the variants instead of returning the same file.
+    """
+    def __init__(self, library_dir=None):
+        self.library_dir = Path(library_dir or Config.LIBRARY_DIR)
+        self.tracks_dir = self.library_dir / "tracks"
+        self.tracks_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.library_dir / "index.db"
+        self._lock = threading.Lock()
+        self.init_database()
+
+    @staticmethod
+    def exists(library_dir=None):
+        """True if a library index has been built."""
+        return (Path(library_dir or Config.LIBRARY_DIR) / "index.db").exists()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tracks (
+                    id TEXT PRIMARY KEY,
+                    mood TEXT NOT NULL,
+                    energy_band TEXT NOT NULL,
+                    suggested_key TEXT NOT NULL,
+                    scale_type TEXT NOT NULL,
+                    rhythmic_pattern TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    served_count INTEGER NOT NULL DEFAULT 0,
+                    last_served_at REAL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tracks_blueprint
+                ON tracks (mood, energy_band, suggested_key, scale_type, rhythmic_pattern)
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def add(self, params, audio_path):
+        """
+        Move a rendered MP3 into the library and index it under its blueprint. Returns the entry id.
+        """
+        track_id = uuid.uuid4().hex
+        filename = f"{track_id}.mp3"
+        shutil.move(str(audio_path), self.tracks_dir / filename)
+        params = dict(params, library_id=track_id)
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT INTO tracks (id, mood, energy_band, suggested_key, scale_type, rhythmic_pattern,
+                                    params, filename, model, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (track_id, *blueprint_key(params), json.dumps(params, default=lambda value: value.tolist()),
+                  filename, Config.MUSIC_GEN_MODEL, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+        return track_id
+
+    def count(self, key):
+        """Number of fresh tracks for a blueprint key, used by the builder to resume."""
+        conn = self._connect()
+        try:
+            (count,) = conn.execute('''
+                SELECT COUNT(*) FROM tracks WHERE mood = ? AND energy_band = ? AND suggested_key = ?
+                AND scale_type = ? AND rhythmic_pattern = ? AND model = ? AND created_at >= ?
+            ''', (*key, Config.MUSIC_GEN_MODEL, self._fresh_after())).fetchone()
+        finally:
+            conn.close()
+        return count
+
+    @staticmethod
+    def _fresh_after():
+        return time.time() - Config.LIBRARY_MAX_AGE_DAYS * 86400
+
+    def lookup(self, params):
+        """
+        Pick a library track for the request, or None if no eligible track matches.
+        A request that already names a library entry (a recreated blueprint) gets that entry.
+        Returns (file path, stored params) and counts the serve.
+        """
+        conn = self._connect()
+        try:
+            with self._lock:
+                if params.get("library_id"):
+                    rows = conn.execute("SELECT * FROM tracks WHERE id = ?", (params["library_id"],)).fetchall()
+                else:
+                    rows = conn.execute('''
+                        SELECT * FROM tracks WHERE mood = ? AND energy_band = ? AND suggested_key = ?
+                        AND scale_type = ? AND rhythmic_pattern = ? AND model = ?
+                        AND created_at >= ? AND served_count < ?
+                    ''', (*blueprint_key(params), Config.MUSIC_GEN_MODEL, self._fresh_after(),
+                          Config.LIBRARY_MAX_SERVES)).fetchall()
+                rows = [row for row in rows if (self.tracks_dir / row["filename"]).exists()]
+                if not rows:
+                    return None
+
+                least_served = min(row["served_count"] for row in rows)
+                row = random.choice([row for row in rows if row["served_count"] == least_served])
+                conn.execute(
+                    "UPDATE tracks SET served_count = served_count + 1, last_served_at = ? WHERE id = ?",
+                    (time.time(), row["id"])
+                )
+                conn.commit()
+        finally:
+            conn.close()
+        return self.tracks_dir / row["filename"], json.loads(row["params"])
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT COUNT(*) AS tracks, COALESCE(SUM(served_count), 0) AS serves,
+                       COUNT(DISTINCT mood || energy_band || suggested_key || scale_type || rhythmic_pattern) AS blueprints
+                FROM tracks
+            ''').fetchone()
+        finally:
+            conn.close()
+        return dict(row)